@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+
+from classify_commits import Classifier
+from compute_metrics import CompactMetricsState, resume_state, save_checkpoint
+from history import (HistoryError, add_merge_argument, commit_record, first_parent_commits, rev_parse,
+                     walk_history_parallel)
+from instrument import add_arguments, instrumented
+from ndjson import write_record, write_records
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Extract, classify and measure commits in one pass over history.")
+    parser.add_argument("-p", required=True, type=str, help="Path to local Git repository")
+    parser.add_argument("--ndjson", action="store_true", help="Stream one JSON record per commit")
+    parser.add_argument("--workers", type=int, default=1, help="Processes extracting file deltas")
+    parser.add_argument("--checkpoint", help="Save the metric state here after the run")
+    parser.add_argument("--since-checkpoint", action="store_true",
+                        help="Resume from --checkpoint and only emit commits after it")
+    add_merge_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.since_checkpoint and not args.checkpoint:
+        parser.error("--since-checkpoint requires --checkpoint")
+    return args
+
+def analyze_history(repo_path, workers=1, merges="all", checkpoint=None, since_checkpoint=False):
+    """Run the classifier and the metrics state machine as stages on one history walk.
+
+    Each commit comes back with the metadata stored in `commits`, its
+    classification and its `metrics` (None for merges, which get no metrics).
+    `checkpoint` and `since_checkpoint` work as in compute_metrics.iter_log,
+    whose checkpoints these are.
+    """
+    if not os.path.isdir(repo_path):
+        return {
+            "status": "error",
+            "message": f"Invalid path: {repo_path}",
+            "commits": []
+        }
+
+    try:
+        results = list(iter_analyzed(repo_path, workers, merges, checkpoint, since_checkpoint))
+    except HistoryError as e:
+        return {
+            "status": "error",
+            "message": str(e),
+            "commits": []
+        }
+
+    corrective_commits = [
+        {"hash": c["hash"], "message": c["message"], "classification": c["classification"]}
+        for c in results if c["classification"] == "Corrective"
+    ]
+
+    return {
+        "status": "success",
+        "repo_path": repo_path,
+        "total_commits": len(results),
+        "commits": results,
+        "corrective_commits": corrective_commits
+    }
+
+def iter_analyzed(repo_path, workers=1, merges="all", checkpoint=None, since_checkpoint=False):
+    classifier = Classifier()
+    head = rev_parse(repo_path)
+    if checkpoint and since_checkpoint:
+        metrics, rev = resume_state(repo_path, checkpoint, head)
+    else:
+        metrics, rev = CompactMetricsState(), head
+    # First-parent still walks the branches so their changes reach the metrics state
+    mainline = first_parent_commits(repo_path, rev) if merges == "first-parent" else None
+    for commit in walk_history_parallel(repo_path, rev, workers, merges="all" if mainline else merges):
+        stats = metrics.update(commit)
+        if mainline is not None and commit["hash"] not in mainline:
+            continue
+        record = commit_record(commit)
+        record["classification"] = classifier.classify(record["message"])
+        record["metrics"] = stats
+        yield record
+
+    if checkpoint:
+        save_checkpoint(checkpoint, metrics, head)
+
+def analyze_history_ndjson(repo_path, workers=1, merges="all", checkpoint=None, since_checkpoint=False):
+    """Stream analyze_history output: one "commit" record per commit, then a "summary" record."""
+    if not os.path.isdir(repo_path):
+        write_record({"type": "summary", "status": "error", "message": f"Invalid path: {repo_path}"})
+        return
+
+    corrective = 0
+    def counted():
+        nonlocal corrective
+        for c in iter_analyzed(repo_path, workers, merges, checkpoint, since_checkpoint):
+            corrective += c["classification"] == "Corrective"
+            yield c
+
+    try:
+        total = write_records(counted(), "commit")
+    except HistoryError as e:
+        write_record({"type": "summary", "status": "error", "message": str(e)})
+        return
+
+    write_record({
+        "type": "summary",
+        "status": "success",
+        "repo_path": repo_path,
+        "total_commits": total,
+        "corrective_commits": corrective
+    })
+    return total
+
+def main():
+    args = arguments()
+    with instrumented(args.timings, args.profile) as recorder, recorder.stage("analyze_history") as stage:
+        if args.ndjson:
+            stage.rows = analyze_history_ndjson(args.p, args.workers, args.merges, args.checkpoint,
+                                                args.since_checkpoint) or 0
+        else:
+            result = analyze_history(args.p, args.workers, args.merges, args.checkpoint, args.since_checkpoint)
+            stage.rows = len(result["commits"])
+            print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
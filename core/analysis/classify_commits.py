@@ -1,9 +1,17 @@
 import argparse
 import os
-import git
 import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from rapidfuzz import fuzz as rfuzz, process
 from thefuzz import fuzz
 
+from history import POOL_CONTEXT, HistoryError, add_merge_argument, walk_history
+from instrument import add_arguments, instrumented
+from ndjson import write_record, write_records
+
 # fuzz matching tolerance
 FUZZ_THRESHOLD = 80
 
@@ -25,31 +33,157 @@ HARDCODED_CATEGORIES = {
     ]
 }
 
+ENGINES = ("indexed", "fuzzy")
+
+# Unique messages per process-pool task in Classifier.classify_batch
+BATCH_CHUNK = 2000
+
+# Unique messages below which classify_batch scores in-process unless workers
+# is given: one core scores about 16k messages a second, and under a few
+# seconds of work pool startup and pickling the scores cost more than they save
+POOL_MIN_MESSAGES = 50000
+
 def arguments():
     parser = argparse.ArgumentParser(description="Classify Git commits based on message content.")
-    parser.add_argument("-p", required=True, type=str, help="Path to local Git repository")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-p", type=str, help="Path to local Git repository")
+    source.add_argument("--batch", type=str,
+                        help="Re-classify stored messages from a JSON array or NDJSON file of "
+                             "strings or {hash, message} objects ('-' for stdin)")
+    parser.add_argument("--ndjson", action="store_true", help="Stream one JSON record per commit")
+    parser.add_argument("--engine", choices=ENGINES, default="indexed",
+                        help="Keyword matcher: precompiled index with fuzzy fallback, or fuzzy only")
+    parser.add_argument("--threshold", type=int, default=FUZZ_THRESHOLD, help="Fuzzy score needed with --batch")
+    parser.add_argument("--workers", type=int, help="Scoring processes with --batch (default: one, or the CPU "
+                                                          f"count from {POOL_MIN_MESSAGES} unique messages)")
+    add_merge_argument(parser)
+    add_arguments(parser)
     return parser.parse_args()
 
 class Category:
     def __init__(self, name, keywords):
         self.name = name
         self.keywords = [kw.lower() for kw in keywords]
+        # One alternation per category: search() hits iff any keyword occurs
+        # verbatim, which covers inflected forms such as "fixes" or "bugs".
+        self.pattern = re.compile("|".join(re.escape(kw) for kw in self.keywords))
 
     def matches(self, message):
         msg = message.lower()
         return any(fuzz.partial_ratio(kw, msg) >= FUZZ_THRESHOLD for kw in self.keywords)
 
+    def matches_exact(self, msg):
+        return self.pattern.search(msg) is not None
+
+    def matches_fuzzy(self, msg, threshold):
+        # thefuzz rounds scores to integers, so anything from threshold - 0.5
+        # may still pass; the cutoff lets rapidfuzz abandon hopeless alignments.
+        best = process.extractOne(msg, self.keywords, scorer=rfuzz.partial_ratio,
+                                  score_cutoff=max(threshold - 0.5, 0))
+        return best is not None and round(best[1]) >= threshold
+
+    def score(self, msg):
+        """Best keyword score for a lowercased message, rounded like thefuzz."""
+        if self.matches_exact(msg):
+            return 100
+        best = process.extractOne(msg, self.keywords, scorer=rfuzz.partial_ratio)
+        return int(round(best[1])) if best else 0
+
 class Classifier:
-    def __init__(self):
+    def __init__(self, engine="indexed"):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown classifier engine: {engine}")
+        self.engine = engine
         self.categories = [Category(name, kws) for name, kws in HARDCODED_CATEGORIES.items()]
+        # Per instance: a cache on the method would be keyed on self, shared by
+        # every Classifier and keep them all alive
+        self._classify_indexed = lru_cache(maxsize=1 << 16)(self._classify_uncached)
 
     def classify(self, message):
-        for category in self.categories:
-            if category.matches(message):
+        if self.engine == "fuzzy":
+            for category in self.categories:
+                if category.matches(message):
+                    return category.name
+            return "None"
+
+        return self._classify_indexed(message.lower(), FUZZ_THRESHOLD)
+
+    def _classify_uncached(self, msg, threshold):
+        # A verbatim keyword scores 100, so the first category with an exact
+        # hit wins unless an earlier one passes fuzzily. Only those earlier
+        # categories need the fuzzy alignment, and it has to run on the whole
+        # message: partial_ratio windows span word boundaries and message ends.
+        first_hit = len(self.categories)
+        for i, category in enumerate(self.categories):
+            if category.matches_exact(msg):
+                first_hit = i
+                break
+        for category in self.categories[:first_hit]:
+            if category.matches_fuzzy(msg, threshold):
                 return category.name
-        return "None"
+        return self.categories[first_hit].name if first_hit < len(self.categories) else "None"
+
+    def classify_batch(self, messages, threshold=None, workers=None):
+        """Classify many messages at once, returning each label with its per-category scores.
+
+        Identical messages are scored once. Scores do not depend on the
+        threshold, so a sweep can re-label the same output without rescoring.
+        Labels match classify() for the same threshold. Scoring runs in this
+        process unless `workers` > 1 is given or there are POOL_MIN_MESSAGES
+        unique messages, in which case it defaults to one process per CPU.
+        """
+        threshold = FUZZ_THRESHOLD if threshold is None else threshold
+        lowered = [m.lower() for m in messages]
+        unique = list(dict.fromkeys(lowered))
+        chunks = [unique[i:i + BATCH_CHUNK] for i in range(0, len(unique), BATCH_CHUNK)]
+        spec = [(c.name, c.keywords) for c in self.categories]
+
+        if workers is None:
+            workers = (os.cpu_count() or 1) if len(unique) >= POOL_MIN_MESSAGES else 1
+        if len(chunks) > 1 and workers > 1:
+            with ProcessPoolExecutor(workers, mp_context=POOL_CONTEXT) as pool:
+                scored = pool.map(_score_chunk, chunks, [spec] * len(chunks))
+                scores = [row for chunk in scored for row in chunk]
+        else:
+            scores = [{c.name: c.score(msg) for c in self.categories} for msg in unique]
+
+        by_message = {}
+        for msg, row in zip(unique, scores):
+            label = next((name for name, score in row.items() if score >= threshold), "None")
+            by_message[msg] = {"classification": label, "scores": row}
+        return [by_message[m] for m in lowered]
+
+def _score_chunk(messages, spec):
+    categories = [Category(name, kws) for name, kws in spec]
+    return [{c.name: c.score(msg) for c in categories} for msg in messages]
+
+def load_messages(path):
+    """Read stored messages as (hash, message) pairs; hash is None for bare strings."""
+    with (sys.stdin if path == "-" else open(path)) as fh:
+        text = fh.read()
+    try:
+        items = json.loads(text)
+        if not isinstance(items, list):
+            items = [items]
+    except ValueError:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [(None, item) if isinstance(item, str) else (item.get("hash"), item["message"]) for item in items]
 
-def classify_commits(repo_path):
+def classify_stored(path, threshold=FUZZ_THRESHOLD, workers=None):
+    """Re-classify stored messages and stream one "commit" record each plus a "summary" record."""
+    pairs = load_messages(path)
+    results = Classifier().classify_batch([m for _, m in pairs], threshold, workers)
+    write_records(({"hash": h, **r} for (h, _), r in zip(pairs, results)), "commit")
+    write_record({
+        "type": "summary",
+        "status": "success",
+        "total_commits": len(pairs),
+        "unique_messages": len({m.lower() for _, m in pairs}),
+        "threshold": threshold
+    })
+    return len(pairs)
+
+def classify_commits(repo_path, engine="indexed", merges="all"):
     if not os.path.isdir(repo_path):
         return {
             "status": "error",
@@ -58,27 +192,14 @@ def classify_commits(repo_path):
         }
 
     try:
-        repo = git.Repo(repo_path)
-    except git.exc.InvalidGitRepositoryError:
+        results = list(iter_classified(repo_path, engine, merges))
+    except HistoryError:
         return {
             "status": "error",
             "message": "Not a valid Git repository",
             "commits": []
         }
 
-    commits = list(repo.iter_commits('HEAD', reverse=True))
-    classifier = Classifier()
-    results = []
-
-    for commit in commits:
-        message = commit.message.strip()
-        classification = classifier.classify(message)
-        results.append({
-            "hash": commit.hexsha,
-            "message": message,
-            "classification": classification
-        })
-
     corrective_commits = [c for c in results if c["classification"] == "Corrective"]
 
     return {
@@ -89,11 +210,55 @@ def classify_commits(repo_path):
         "corrective_commits": corrective_commits
     }
 
+def iter_classified(repo_path, engine="indexed", merges="all"):
+    classifier = Classifier(engine)
+    for commit in walk_history(repo_path, numstat=False, merges=merges):
+        message = commit["message"]
+        yield {
+            "hash": commit["hash"],
+            "message": message,
+            "classification": classifier.classify(message)
+        }
+
+def classify_commits_ndjson(repo_path, engine="indexed", merges="all"):
+    """Stream classify_commits output: one "commit" record per commit, then a "summary" record."""
+    if not os.path.isdir(repo_path):
+        write_record({"type": "summary", "status": "error", "message": f"Invalid path: {repo_path}"})
+        return
+
+    corrective = 0
+    def counted():
+        nonlocal corrective
+        for c in iter_classified(repo_path, engine, merges):
+            corrective += c["classification"] == "Corrective"
+            yield c
+
+    try:
+        total = write_records(counted(), "commit")
+    except HistoryError:
+        write_record({"type": "summary", "status": "error", "message": "Not a valid Git repository"})
+        return
+
+    write_record({
+        "type": "summary",
+        "status": "success",
+        "repo_path": repo_path,
+        "total_commits": total,
+        "corrective_commits": corrective
+    })
+    return total
 
 def main():
     args = arguments()
-    result = classify_commits(args.p)
-    print(json.dumps(result, indent=2))
+    with instrumented(args.timings, args.profile) as recorder, recorder.stage("classify_commits") as stage:
+        if args.batch:
+            stage.rows = classify_stored(args.batch, args.threshold, args.workers)
+        elif args.ndjson:
+            stage.rows = classify_commits_ndjson(args.p, args.engine, args.merges) or 0
+        else:
+            result = classify_commits(args.p, args.engine, args.merges)
+            stage.rows = len(result["commits"])
+            print(json.dumps(result, indent=2))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
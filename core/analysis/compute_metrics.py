@@ -1,8 +1,13 @@
 import json
 import logging
-from pydriller import Repository
 import math
 import os
+from array import array
+
+from history import (HistoryError, add_merge_argument, first_parent_commits, is_ancestor, rev_parse,
+                     walk_history_parallel)
+from instrument import add_arguments, instrumented
+from ndjson import write_record, write_records
 
 class CommitFile:
 
@@ -27,6 +32,16 @@ ALLOWED_EXT = {
 }
 ALLOWED_FILE = {"GRADLEW","MAKEFILE","CMAKE","CONFIGURE","RUN"}
 
+# REXP weighs each earlier change by recency: one made a year ago counts half
+REXP_HALF_LIFE = 365.25 * 86400
+
+def decayed(value, since, now):
+    """Decay an experience accumulator last updated at `since` to `now`.
+
+    Author dates are not monotonic along history, so an earlier `now` leaves it as is.
+    """
+    return value * 0.5 ** (max(now - since, 0) / REXP_HALF_LIFE)
+
 def verify_extension(fname: str) -> bool:
     base = fname.rsplit("/", 1)[-1]          # strip path
     if "." in base:
@@ -115,12 +130,19 @@ def getCommitStatsProperties(stats, commitFiles, devExperience, author, unixTime
     ndev = len(devs_touched)
     age = sum(file_age_days) / len(file_age_days) if file_age_days else 0
 
-    # Developer experience
+    # Developer experience: prior changes overall (exp), decayed by age (rexp)
+    # and in the subsystems this change touches (sexp)
     if author not in devExperience:
-        devExperience[author] = {"total": 0, "timestamps": []}
-    exp = devExperience[author]["total"]
-    devExperience[author]["total"] += 1
-    devExperience[author]["timestamps"].append(unixTimeStamp)
+        devExperience[author] = {"total": 0, "rexp": 0.0, "last": unixTimeStamp, "subsystems": {}}
+    dev = devExperience[author]
+    exp = dev["total"]
+    rexp = decayed(dev["rexp"], dev["last"], unixTimeStamp)
+    sexp = sum(dev["subsystems"].get(s, 0) for s in subsystemsSeen)
+    dev["total"] += 1
+    dev["rexp"] = rexp + 1
+    dev["last"] = max(dev["last"], unixTimeStamp)
+    for s in subsystemsSeen:
+        dev["subsystems"][s] = dev["subsystems"].get(s, 0) + 1
 
     # Entropy
     totalLOCModified = sum(locModifiedPerFile)
@@ -131,64 +153,344 @@ def getCommitStatsProperties(stats, commitFiles, devExperience, author, unixTime
             if p > 0:
                 entropy -= p * math.log(p, 2)
 
-    return f', "la": {la}, "ld": {ld}, "lt": {lt}, "ns": {ns}, "nd": {nd}, "nf": {nf}, "entropy": {entropy}, "exp": {exp}, "ndev": {ndev}, "age": {age}, "nuc": {nuc}'
+    return {"la": la, "ld": ld, "lt": lt, "ns": ns, "nd": nd, "nf": nf, "entropy": entropy,
+            "exp": exp, "rexp": rexp, "sexp": sexp, "ndev": ndev, "age": age, "nuc": nuc}
 
-def log(repo_path):
-    commitFiles   = {}
-    devExperience = {}
-    results       = []
-    renamed_files = {}
-    file_devs = {}
+CHECKPOINT_VERSION = 2
 
+class MetricsState:
+    """State carried from commit to commit, so metrics can run as a stage over a history stream."""
 
-    for commit in Repository(repo_path).traverse_commits():
-        if len(commit.parents) > 1:
-            continue
+    def __init__(self):
+        self.commitFiles   = {}
+        self.devExperience = {}
+        self.renamed_files = {}
+
+    def to_checkpoint(self, head):
+        return {
+            "version":       CHECKPOINT_VERSION,
+            "head":          head,
+            "files":         {name: [f.loc, sorted(f.authors), f.lastchanged, f.nuc]
+                              for name, f in self.commitFiles.items()},
+            "devExperience": self.devExperience,
+            "renamed_files": self.renamed_files,
+        }
+
+    @classmethod
+    def from_checkpoint(cls, data):
+        state = cls()
+        for name, (loc, authors, lastchanged, nuc) in data["files"].items():
+            state.commitFiles[name] = CommitFile(name, loc, authors, lastchanged)
+            state.commitFiles[name].nuc = nuc
+        state.devExperience = data["devExperience"]
+        state.renamed_files = data["renamed_files"]
+        return state
+
+    def update(self, commit):
+        """Compute metrics for one `walk_history` record, oldest first. Merges yield None."""
+        if len(commit["parents"]) > 1:
+            return None
 
         # Track actual file renames
-        for mod in commit.modified_files:
-            if mod.change_type.name == "RENAME":
-                old_path = mod.old_path
-                new_path = mod.new_path
-                if old_path and new_path:
-                    renamed_files[new_path] = old_path
+        for f in commit["files"]:
+            if f["old_path"]:
+                self.renamed_files[f["path"]] = f["old_path"]
 
         stats = [
-            f"{mod.added_lines}\t{mod.deleted_lines}\t{mod.new_path or mod.old_path}"
-            for mod in commit.modified_files
-            if verify_extension(mod.new_path or mod.old_path)
+            f"{f['added']}\t{f['deleted']}\t{f['path']}"
+            for f in commit["files"]
+            if verify_extension(f["path"])
         ]
 
-        author  = commit.author.name
-        unix_ts = int(commit.author_date.timestamp())
-
-        stat_props_str = getCommitStatsProperties(
+        return getCommitStatsProperties(
             stats,
-            commitFiles,
-            devExperience,
-            author,
-            unix_ts,
-            renamed_files  # ← pass it here
+            self.commitFiles,
+            self.devExperience,
+            commit["author_name"],
+            commit["author_timestamp"],
+            self.renamed_files
         )
 
-        commit_obj = {
-            "commit_hash": commit.hash,
-            "author":      author,
-            "author_date": commit.author_date.isoformat(),
-            "message":     commit.msg,
-            "stats":       metrics,
+class CompactMetricsState:
+    """MetricsState with interned ids and columnar storage, for histories with many paths.
+
+    Every path and author gets a dense integer id. Per-path loc, lastchanged
+    and nuc live in typed arrays indexed by path id, and each path's author
+    set is an int bitset over author ids, so ndev is an OR plus a popcount.
+    Developer experience is kept in per-author arrays the same way. Metrics
+    and checkpoints are identical to MetricsState's, and either
+    backend can resume from the other's checkpoint.
+    """
+
+    def __init__(self):
+        self.path_ids      = {}                 # path -> id, for every path ever seen
+        self.present       = bytearray()        # 1 while the path is a tracked file
+        self.loc           = array("q")
+        self.lastchanged   = array("q")
+        self.nuc           = array("q")
+        self.authors       = []                 # id -> bitset of author ids
+        self.author_ids    = {}                 # author -> id
+        self.author_names  = []                 # id -> author
+        self.exp           = array("q")         # id -> commits so far
+        self.rexp          = array("d")         # id -> decayed commit count as of rexp_last
+        self.rexp_last     = array("q")
+        self.sexp          = []                 # id -> {subsystem: commits so far}
+        self.renamed_files = {}
+
+    def _path_id(self, name):
+        pid = self.path_ids.get(name)
+        if pid is None:
+            pid = self.path_ids[name] = len(self.present)
+            self.present.append(0)
+            self.loc.append(0)
+            self.lastchanged.append(0)
+            self.nuc.append(0)
+            self.authors.append(0)
+        return pid
+
+    def _author_id(self, author, now=0):
+        aid = self.author_ids.get(author)
+        if aid is None:
+            aid = self.author_ids[author] = len(self.author_names)
+            self.author_names.append(author)
+            self.exp.append(0)
+            self.rexp.append(0.0)
+            self.rexp_last.append(now)
+            self.sexp.append({})
+        return aid
+
+    def _author_names(self, bits):
+        names = []
+        while bits:
+            low = bits & -bits
+            names.append(self.author_names[low.bit_length() - 1])
+            bits ^= low
+        return names
+
+    def _track(self, pid, loc, authors, lastchanged, nuc):
+        self.present[pid] = 1
+        self.loc[pid] = loc
+        self.authors[pid] = authors
+        self.lastchanged[pid] = lastchanged
+        self.nuc[pid] = nuc
+
+    def to_checkpoint(self, head):
+        return {
+            "version":       CHECKPOINT_VERSION,
+            "head":          head,
+            "files":         {name: [self.loc[pid], sorted(self._author_names(self.authors[pid])),
+                                     self.lastchanged[pid], self.nuc[pid]]
+                              for name, pid in self.path_ids.items() if self.present[pid]},
+            "devExperience": {name: {"total": self.exp[aid], "rexp": self.rexp[aid],
+                                     "last": self.rexp_last[aid], "subsystems": self.sexp[aid]}
+                              for aid, name in enumerate(self.author_names)},
+            "renamed_files": self.renamed_files,
+        }
+
+    @classmethod
+    def from_checkpoint(cls, data):
+        state = cls()
+        for name, dev in data["devExperience"].items():
+            aid = state._author_id(name)
+            state.exp[aid] = dev["total"]
+            state.rexp[aid] = dev["rexp"]
+            state.rexp_last[aid] = dev["last"]
+            state.sexp[aid] = dev["subsystems"]
+        for name, (loc, authors, lastchanged, nuc) in data["files"].items():
+            bits = 0
+            for author in authors:
+                bits |= 1 << state._author_id(author)
+            state._track(state._path_id(name), loc, bits, lastchanged, nuc)
+        state.renamed_files = data["renamed_files"]
+        return state
+
+    def update(self, commit):
+        """Same metrics as MetricsState.update, computed on the columnar state."""
+        if len(commit["parents"]) > 1:
+            return None
+
+        for f in commit["files"]:
+            if f["old_path"]:
+                self.renamed_files[f["path"]] = f["old_path"]
+
+        present, loc, lastchanged, nuc_of, authors = self.present, self.loc, self.lastchanged, self.nuc, self.authors
+        author = commit["author_name"]
+        now = commit["author_timestamp"]
+        aid = self._author_id(author, now)
+        bit = 1 << aid
+
+        la = ld = lt = nuc = 0
+        devs_touched = 0
+        subsystemsSeen = set()
+        directoriesSeen = set()
+        locModifiedPerFile = []
+        file_age_days = []
+
+        for f in commit["files"]:
+            if not verify_extension(f["path"]):
+                continue
+            added, deleted = f["added"], f["deleted"]
+            fileName = f["path"].replace("'", '').replace('"', '').replace("\\", "")
+
+            la += added
+            ld += deleted
+            locModifiedPerFile.append(added + deleted)
+
+            fileDirs = fileName.split("/")
+            subsystemsSeen.add(fileDirs[0] if len(fileDirs) > 1 else "root")
+            directoriesSeen.add("/".join(fileDirs[:-1]) if len(fileDirs) > 1 else "root")
+
+            pid = self._path_id(fileName)
+            if not present[pid]:
+                renamed_from = self.renamed_files.get(fileName)
+                old = self.path_ids.get(renamed_from) if renamed_from else None
+                if old is not None and present[old]:
+                    self._track(pid, loc[old], authors[old], lastchanged[old], nuc_of[old])
+                    present[old] = 0
+
+            if present[pid]:
+                lt += loc[pid]
+                devs_touched |= authors[pid]
+                delta_days = (now - lastchanged[pid]) / 86400
+                if delta_days >= 0:
+                    file_age_days.append(delta_days)
+                loc[pid] += added - deleted
+                lastchanged[pid] = now
+                authors[pid] |= bit
+                nuc_of[pid] += 1
+                nuc += nuc_of[pid]
+            else:
+                self._track(pid, added - deleted, bit, now, 1)
+
+        nf = len(locModifiedPerFile)
+        exp = self.exp[aid]
+        rexp = decayed(self.rexp[aid], self.rexp_last[aid], now)
+        subsystems = self.sexp[aid]
+        sexp = sum(subsystems.get(s, 0) for s in subsystemsSeen)
+        self.exp[aid] += 1
+        self.rexp[aid] = rexp + 1
+        self.rexp_last[aid] = max(self.rexp_last[aid], now)
+        for s in subsystemsSeen:
+            subsystems[s] = subsystems.get(s, 0) + 1
+
+        totalLOCModified = sum(locModifiedPerFile)
+        entropy = 0
+        if totalLOCModified > 0:
+            for modified in locModifiedPerFile:
+                p = modified / totalLOCModified
+                if p > 0:
+                    entropy -= p * math.log(p, 2)
+
+        return {"la": la, "ld": ld, "lt": lt / nf if nf > 0 else 0, "ns": len(subsystemsSeen),
+                "nd": len(directoriesSeen), "nf": nf, "entropy": entropy, "exp": exp, "rexp": rexp, "sexp": sexp,
+                "ndev": devs_touched.bit_count(),
+                "age": sum(file_age_days) / len(file_age_days) if file_age_days else 0, "nuc": nuc}
+
+# --state choices; both produce the same metrics and checkpoints
+STATE_BACKENDS = {"objects": MetricsState, "compact": CompactMetricsState}
+
+def save_checkpoint(path, state, head):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state.to_checkpoint(head), fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def resume_state(repo_path, path, head, backend="compact"):
+    """Return the state and revision range to continue from the checkpoint at `path`.
+
+    Falls back to a fresh state over the full history when the checkpoint is
+    missing, from another format version, or its commit is no longer an
+    ancestor of `head` (force-push, rebase, different repository). The state
+    is the same for every --merges mode, so checkpoints are shared by all.
+    """
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+    except (OSError, ValueError) as e:
+        logging.warning("Checkpoint %s unusable (%s); running a full pass.", path, e)
+        return STATE_BACKENDS[backend](), head
+
+    if data.get("version") != CHECKPOINT_VERSION:
+        logging.warning("Checkpoint %s has version %s; running a full pass.", path, data.get("version"))
+        return STATE_BACKENDS[backend](), head
+    if not is_ancestor(repo_path, data["head"], head):
+        logging.warning("Checkpoint commit %s is not an ancestor of %s; running a full pass.", data["head"], head)
+        return STATE_BACKENDS[backend](), head
+    return STATE_BACKENDS[backend].from_checkpoint(data), f"{data['head']}..{head}"
+
+def iter_log(repo_path, checkpoint=None, since_checkpoint=False, backend="compact", workers=1, merges="no-merges"):
+    """Yield metrics per non-merge commit, oldest first.
+
+    With `checkpoint` the final state is saved there; with `since_checkpoint`
+    the walk resumes from it and only commits after the checkpoint are yielded.
+    `backend` picks the state implementation from STATE_BACKENDS. With
+    `workers` > 1 the file deltas are extracted by a process pool while this
+    loop stays the single, ordered reducer of the stateful metrics. Merges get
+    no metrics, so git leaves them out of the walk altogether. "first-parent"
+    reports the mainline only, with the same metrics as the full walk: side
+    branches still update the state, their commits are just not yielded.
+    """
+    head = rev_parse(repo_path)
+    if checkpoint and since_checkpoint:
+        state, rev = resume_state(repo_path, checkpoint, head, backend)
+    else:
+        state, rev = STATE_BACKENDS[backend](), head
+    mainline = first_parent_commits(repo_path, rev) if merges == "first-parent" else None
+
+    for commit in walk_history_parallel(repo_path, rev, workers, merges="no-merges"):
+        stats = state.update(commit)
+        if stats is None or (mainline is not None and commit["hash"] not in mainline):
+            continue
+
+        yield {
+            "commit_hash": commit["hash"],
+            "author":      commit["author_name"],
+            "author_date": commit["author_date"],
+            "message":     commit["message"],
+            "stats":       stats,
         }
-        results.append(commit_obj)
 
+    if checkpoint:
+        save_checkpoint(checkpoint, state, head)
+
+def log(repo_path, checkpoint=None, since_checkpoint=False, backend="compact", workers=1, merges="no-merges"):
+    results = list(iter_log(repo_path, checkpoint, since_checkpoint, backend, workers, merges))
     logging.info("Done getting/parsing git commits.")
     return results
 
+def log_ndjson(repo_path, checkpoint=None, since_checkpoint=False, backend="compact", workers=1, merges="no-merges"):
+    """Stream log() output: one "metrics" record per non-merge commit, then a "summary" record."""
+    try:
+        total = write_records(iter_log(repo_path, checkpoint, since_checkpoint, backend, workers, merges), "metrics")
+    except HistoryError as e:
+        write_record({"type": "summary", "status": "error", "message": str(e)})
+        return
+    write_record({"type": "summary", "status": "success", "repo_path": repo_path, "total_commits": total})
+    return total
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--path", required=True, help="Path to local Git repository")
+    parser.add_argument("--ndjson", action="store_true", help="Stream one JSON record per commit")
+    parser.add_argument("--checkpoint", help="Save the metric state here after the run")
+    parser.add_argument("--since-checkpoint", action="store_true",
+                        help="Resume from --checkpoint and only emit commits after it")
+    parser.add_argument("--state", choices=sorted(STATE_BACKENDS), default="compact",
+                        help="State backend: one object per path, or compact interned columns")
+    parser.add_argument("--workers", type=int, default=1, help="Processes extracting file deltas")
+    add_merge_argument(parser, default="no-merges")
+    add_arguments(parser)
     args = parser.parse_args()
+    if args.since_checkpoint and not args.checkpoint:
+        parser.error("--since-checkpoint requires --checkpoint")
 
-    output = log(args.path)
-    print(json.dumps(output, indent=2))
+    with instrumented(args.timings, args.profile) as recorder, recorder.stage("compute_metrics.log") as stage:
+        if args.ndjson:
+            stage.rows = log_ndjson(args.path, args.checkpoint, args.since_checkpoint, args.state, args.workers,
+                                    args.merges) or 0
+        else:
+            output = log(args.path, args.checkpoint, args.since_checkpoint, args.state, args.workers, args.merges)
+            stage.rows = len(output)
+            print(json.dumps(output, indent=2))
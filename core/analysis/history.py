@@ -0,0 +1,234 @@
+import io
+import multiprocessing
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+# Field and record separators for the `git log` format; neither can appear in
+# names, emails, dates or hashes and are vanishingly rare in messages.
+FIELD_SEP = "\x1f"
+RECORD_SEP = "\x1e"
+LOG_FORMAT = RECORD_SEP + FIELD_SEP.join(["%H", "%P", "%an", "%ae", "%at", "%aI", "%cn", "%ce", "%ct", "%cI", "%B"])
+
+CHUNK_SIZE = 1 << 16
+
+# Commits per `git log --stdin` call in walk_history_parallel
+COMMITS_PER_CHUNK = 1000
+
+# Start method for the process pools here and in classify_commits. The analysis
+# server calls them from handler threads, and a plain fork would copy whatever
+# locks those threads hold into the workers
+POOL_CONTEXT = multiprocessing.get_context("forkserver")
+
+# Which commits a walk selects, as git revision options, so every stage can
+# agree on one history and unwanted merges are dropped by git before any diff:
+#   all           every commit reachable from rev
+#   no-merges     no merge commits at all
+#   first-parent  the mainline only; stages whose state depends on every
+#                 change (metrics) still read the branches, see first_parent_commits
+MERGE_MODES = {
+    "all": [],
+    "no-merges": ["--no-merges"],
+    "first-parent": ["--first-parent"],
+}
+
+class HistoryError(Exception):
+    pass
+
+def _tokens(stream):
+    """Split a `git log -z` byte stream into NUL-terminated text tokens."""
+    pending = b""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parts = (pending + chunk).split(b"\0")
+        pending = parts.pop()
+        for part in parts:
+            yield part.decode("utf-8", errors="replace")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+def _parse_header(token):
+    (sha, parents, author_name, author_email, author_ts, author_date,
+     committer_name, committer_email, committer_ts, committed_date, message) = token[1:].split(FIELD_SEP, 10)
+    return {
+        "hash": sha,
+        "parents": parents.split(),
+        "author_name": author_name,
+        "author_email": author_email,
+        "author_timestamp": int(author_ts),
+        "author_date": author_date,
+        "committer_name": committer_name,
+        "committer_email": committer_email,
+        "committer_timestamp": int(committer_ts),
+        "committed_date": committed_date,
+        "message": message.strip(),
+        "files": [],
+    }
+
+def _file_stat(added, deleted, path, old_path=None):
+    binary = added == "-"
+    return {
+        "path": path,
+        "old_path": old_path,
+        "added": 0 if binary else int(added),
+        "deleted": 0 if binary else int(deleted),
+        "binary": binary,
+    }
+
+def add_merge_argument(parser, default="all"):
+    parser.add_argument("--merges", choices=MERGE_MODES, default=default,
+                        help=f"Commits to walk: all, none of the merges, or the first-parent mainline (default: {default})")
+
+def walk_history(repo_path, rev="HEAD", numstat=True, renames=True, merge_diffs=False, merges="all"):
+    """Yield every commit reachable from `rev`, oldest first, from one `git log` process.
+
+    Each record carries the commit metadata, the stripped message and, when
+    `numstat` is set, a `files` list with per-file line counts. Renames are
+    reported with `old_path` set when `renames` is on; binary files count as
+    zero added/deleted lines. Merge commits have no file stats unless
+    `merge_diffs` asks for their diff against the first parent. `merges`
+    picks the commits walked (see MERGE_MODES).
+    """
+    cmd = ["git", "log", "-z", "--reverse", *MERGE_MODES[merges], *_log_options(numstat, renames, merge_diffs),
+           rev, "--"]
+
+    proc = subprocess.Popen(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        yield from _parse_log(proc.stdout)
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode(errors="replace")
+        proc.stderr.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise HistoryError(f"git log failed: {stderr.strip()}")
+
+def _log_options(numstat, renames, merge_diffs):
+    options = [f"--format={LOG_FORMAT}"]
+    if numstat:
+        options += ["--numstat", "-M" if renames else "--no-renames"]
+        # Explicit either way: --first-parent would otherwise turn merge diffs on
+        options.append("--diff-merges=first-parent" if merge_diffs else "--diff-merges=off")
+    return options
+
+def _parse_log(stream):
+    """Yield commit records from a `git log -z --format=LOG_FORMAT [--numstat]` byte stream."""
+    commit = None
+    rename = None
+    for token in _tokens(stream):
+        if rename is not None:
+            # `-z` renames are "added\tdeleted\t" followed by the old and new path tokens.
+            rename.append(token)
+            if len(rename) == 4:
+                commit["files"].append(_file_stat(*rename[:2], rename[3], rename[2]))
+                rename = None
+            continue
+        token = token.lstrip("\n")
+        if token.startswith(RECORD_SEP):
+            if commit is not None:
+                yield commit
+            commit = _parse_header(token)
+        elif token:
+            added, deleted, path = token.split("\t", 2)
+            if path:
+                commit["files"].append(_file_stat(added, deleted, path))
+            else:
+                rename = [added, deleted]
+    if commit is not None:
+        yield commit
+
+def _log_chunk(repo_path, shas, options):
+    """Records for `shas`, in the given order, from one `git log --no-walk --stdin` (runs in a pool worker)."""
+    proc = subprocess.run(["git", "log", "-z", "--no-walk=unsorted", "--stdin", *options],
+                          cwd=repo_path, input="\n".join(shas).encode(), capture_output=True)
+    if proc.returncode != 0:
+        raise HistoryError(f"git log failed: {proc.stderr.decode(errors='replace').strip()}")
+    return list(_parse_log(io.BytesIO(proc.stdout)))
+
+def walk_history_parallel(repo_path, rev="HEAD", workers=None, numstat=True, renames=True, merge_diffs=False,
+                          merges="all", chunk_size=COMMITS_PER_CHUNK):
+    """walk_history with the diffing and parsing spread over a process pool.
+
+    With one worker this is walk_history. Otherwise the commit list comes
+    from one `git rev-list --reverse`, is cut into chunks of `chunk_size`,
+    and each chunk is logged by a pool worker. Chunks are yielded strictly
+    in order, so the records and their order are identical to walk_history
+    and stateful consumers can reduce them as they arrive. At most two
+    chunks per worker are in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield from walk_history(repo_path, rev, numstat, renames, merge_diffs, merges)
+        return
+
+    proc = subprocess.run(["git", "rev-list", "--reverse", *MERGE_MODES[merges], rev, "--"], cwd=repo_path,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise HistoryError(f"git rev-list failed: {proc.stderr.strip()}")
+    shas = proc.stdout.split()
+    if len(shas) <= chunk_size:
+        yield from walk_history(repo_path, rev, numstat, renames, merge_diffs, merges)
+        return
+
+    options = _log_options(numstat, renames, merge_diffs)
+    chunks = (shas[i:i + chunk_size] for i in range(0, len(shas), chunk_size))
+    with ProcessPoolExecutor(workers, mp_context=POOL_CONTEXT) as pool:
+        pending = deque(pool.submit(_log_chunk, repo_path, chunk, options)
+                        for _, chunk in zip(range(2 * workers), chunks))
+        while pending:
+            records = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(pool.submit(_log_chunk, repo_path, chunk, options))
+            yield from records
+
+def rev_parse(repo_path, rev="HEAD"):
+    """Resolve `rev` to a full commit hash."""
+    proc = subprocess.run(["git", "rev-parse", "--verify", f"{rev}^{{commit}}"], cwd=repo_path,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise HistoryError(f"git rev-parse {rev} failed: {proc.stderr.strip()}")
+    return proc.stdout.strip()
+
+def first_parent_commits(repo_path, rev="HEAD"):
+    """The set of commits on `rev`'s first-parent chain (`rev` may be a range).
+
+    Stateful stages walk the whole history so side-branch changes reach
+    their state, and report only the commits in this set.
+    """
+    proc = subprocess.run(["git", "rev-list", "--first-parent", rev, "--"], cwd=repo_path,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise HistoryError(f"git rev-list failed: {proc.stderr.strip()}")
+    return set(proc.stdout.split())
+
+def is_ancestor(repo_path, ancestor, rev="HEAD"):
+    """True when `ancestor` exists and is reachable from `rev`, i.e. history was not rewritten."""
+    proc = subprocess.run(["git", "merge-base", "--is-ancestor", ancestor, rev], cwd=repo_path,
+                          capture_output=True)
+    return proc.returncode == 0
+
+def commit_record(commit):
+    """Shape a walker record like the commit metadata stored in the `commits` table."""
+    return {
+        "hash": commit["hash"],
+        "author_name": commit["author_name"],
+        "author_email": commit["author_email"],
+        "authored_date": _utc_iso(commit["author_timestamp"]),
+        "committer_name": commit["committer_name"],
+        "committer_email": commit["committer_email"],
+        "committed_date": _utc_iso(commit["committer_timestamp"]),
+        "message": commit["message"],
+        "parent_hashes": commit["parents"],
+        "is_merge": len(commit["parents"]) > 1,
+        "files_changed": [f["path"] for f in commit["files"]],
+        "lines_added": sum(f["added"] for f in commit["files"]),
+        "lines_deleted": sum(f["deleted"] for f in commit["files"]),
+    }
+
+def _utc_iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None).isoformat()
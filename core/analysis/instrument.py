@@ -0,0 +1,177 @@
+import cProfile
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-stage cost accounting for the analysis scripts. A stage records:
+#   wall_ms        wall-clock time
+#   subprocesses   processes started through subprocess (git, mostly)
+#   bytes_read     bytes this process read, pipes from git included (/proc/self/io rchar)
+#   peak_rss_mb    highest resident set of this process plus its children while
+#                  the stage ran, sampled every RSS_INTERVAL (None without /proc);
+#                  stages running concurrently in the server share one process
+#   rows           records the stage produced, as reported by the caller
+#   error          "<type>: <message>" of the exception that ended the stage, if any
+
+# Seconds between RSS samples while a stage runs
+RSS_INTERVAL = 0.05
+
+_spawn_lock = threading.Lock()
+_spawned = 0
+_installed = False
+
+def _count_spawns():
+    """Wrap subprocess.Popen once so every process started through it is counted."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    original = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        global _spawned
+        with _spawn_lock:
+            _spawned += 1
+        original(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counting_init
+
+def _bytes_read():
+    try:
+        with open("/proc/self/io") as fh:
+            for line in fh:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _vm_rss_kb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _children(pid="self"):
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as fh:
+                pids += fh.read().split()
+    except OSError:
+        pass
+    return pids
+
+def _rss_kb():
+    """Resident set of this process and all its descendants, in kilobytes."""
+    total, pending = _vm_rss_kb(), _children()
+    while pending:
+        pid = pending.pop()
+        total += _vm_rss_kb(pid)
+        pending += _children(pid)
+    return total
+
+class _RssSampler(threading.Thread):
+    """Samples _rss_kb() until stopped and keeps the highest value."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.stopped = threading.Event()
+        self.peak_kb = _rss_kb()
+
+    def run(self):
+        while not self.stopped.wait(RSS_INTERVAL):
+            self.peak_kb = max(self.peak_kb, _rss_kb())
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return max(self.peak_kb, _rss_kb())
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.error = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._spawned = _spawned
+        self._read = _bytes_read()
+        self._rss = _RssSampler() if os.path.exists("/proc/self/status") else None
+        if self._rss:
+            self._rss.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        read = _bytes_read()
+        self.wall_ms = round((time.perf_counter() - self._start) * 1000, 1)
+        self.subprocesses = _spawned - self._spawned
+        self.bytes_read = read - self._read if read is not None and self._read is not None else None
+        self.peak_rss_mb = round(self._rss.stop() / 1024, 1) if self._rss else None
+        return False
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "wall_ms": self.wall_ms,
+            "subprocesses": self.subprocesses,
+            "bytes_read": self.bytes_read,
+            "peak_rss_mb": self.peak_rss_mb,
+            "rows": self.rows,
+            **({"error": self.error} if self.error else {}),
+        }
+
+class Recorder:
+    """Collects the stages of one script run or server call."""
+
+    def __init__(self):
+        _count_spawns()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        # Recorded even when the stage raises: failed runs are the ones to diagnose
+        stage = Stage(name)
+        try:
+            with stage:
+                yield stage
+        finally:
+            self.stages.append(stage.to_dict())
+
+    def write(self, path):
+        with open(path, "w") as fh:
+            json.dump(self.stages, fh, indent=2)
+
+@contextmanager
+def instrumented(timings=None, profile=None):
+    """Run a script body with stage timings written to `timings` and a cProfile dump to `profile`.
+
+    Either may be None; the recorder is always returned so callers need not branch.
+    """
+    recorder = Recorder()
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield recorder
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if timings:
+            recorder.write(timings)
+
+def add_arguments(parser):
+    parser.add_argument("--timings", metavar="FILE", help="Write per-stage wall time, subprocesses, bytes read, "
+                                                          "peak RSS during the stage and rows as JSON")
+    parser.add_argument("--profile", metavar="FILE", help="Write a cProfile dump (read it with pstats or snakeviz)")
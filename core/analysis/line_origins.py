@@ -0,0 +1,265 @@
+import codecs
+import re
+import subprocess
+from bisect import bisect_right
+
+from history import HistoryError
+
+# Commit header in the `git log -p` stream; diff and hunk lines never start with NUL.
+COMMIT_MARK = "\0"
+LOG_FORMAT = "%x00%H %P"
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+QUOTED_PAIR = re.compile(r'^"((?:[^"\\]|\\.)*)" "((?:[^"\\]|\\.)*)"$')
+
+class FileDiff:
+    """One file section of a diff: paths are None for the /dev/null side."""
+
+    __slots__ = ("old_path", "new_path", "binary", "hunks")
+
+    def __init__(self, old_path=None, new_path=None):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.binary = False
+        self.hunks = []         # (old_start, old_count, new_start, new_count), 1-based like the header
+
+    @property
+    def renamed(self):
+        return self.old_path is not None and self.new_path is not None and self.old_path != self.new_path
+
+    def deleted_lines(self):
+        """Old-side line numbers removed or rewritten by this diff."""
+        return [ln for start, count, _, _ in self.hunks for ln in range(start, start + count)]
+
+def unquote_path(raw):
+    """Undo git's C-style quoting of unusual paths ("a/caf\\303\\251.py")."""
+    if not raw.startswith('"'):
+        return raw
+    data = codecs.escape_decode(raw[1:-1].encode("utf-8", "surrogateescape"))[0]
+    return data.decode("utf-8", "surrogateescape")
+
+def _strip_prefix(path, prefix):
+    # git ends ---/+++ paths that contain spaces with a tab
+    path = path[:-1] if path.endswith("\t") else path
+    if path == "/dev/null":
+        return None
+    path = unquote_path(path)
+    return path[len(prefix):] if path.startswith(prefix) else path
+
+def _header_paths(rest):
+    """Paths from `diff --git a/X b/Y`; only reliable when X == Y or the pair is quoted."""
+    quoted = QUOTED_PAIR.match(rest)
+    if quoted:
+        return _strip_prefix(f'"{quoted.group(1)}"', "a/"), _strip_prefix(f'"{quoted.group(2)}"', "b/")
+    half = (len(rest) - 1) // 2
+    if rest[half] == " " and rest[2:half] == rest[half + 3:]:
+        return rest[2:half], rest[half + 3:]
+    return None, None
+
+def parse_diff(lines):
+    """Yield a FileDiff per file section of a unified diff given as text lines.
+
+    Hunk bodies are skipped by the counts in their headers, so content lines
+    that look like headers (a removed "-- comment" shows as "--- comment")
+    cannot be mistaken for one.
+    """
+    current = None
+    remaining = 0
+    for line in lines:
+        if remaining:
+            if not line.startswith("\\"):
+                remaining -= 1
+            continue
+        if line.startswith("diff --git "):
+            if current is not None:
+                yield current
+            current = FileDiff(*_header_paths(line[11:]))
+        elif current is None:
+            continue
+        elif line.startswith("@@ "):
+            match = HUNK_HEADER.match(line)
+            old_start, old_count, new_start, new_count = (
+                int(match.group(1)), int(match.group(2) or 1), int(match.group(3)), int(match.group(4) or 1))
+            current.hunks.append((old_start, old_count, new_start, new_count))
+            remaining = old_count + new_count
+        elif line.startswith("--- "):
+            current.old_path = _strip_prefix(line[4:], "a/")
+        elif line.startswith("+++ "):
+            current.new_path = _strip_prefix(line[4:], "b/")
+        elif line.startswith("rename from "):
+            current.old_path = unquote_path(line[12:])
+        elif line.startswith("rename to "):
+            current.new_path = unquote_path(line[10:])
+        elif line.startswith("new file mode "):
+            current.old_path = None
+        elif line.startswith("deleted file mode "):
+            current.new_path = None
+        elif line.startswith("Binary files ") or line.startswith("GIT binary patch"):
+            current.binary = True
+    if current is not None:
+        yield current
+
+class LineOrigins:
+    """Piece table for one file: runs of consecutive lines introduced by the same commit.
+
+    `starts` holds the 0-based first line of each run and `origins` the id of
+    the commit that introduced it, so a lookup is one bisect.
+    """
+
+    __slots__ = ("starts", "origins", "length")
+
+    def __init__(self):
+        self.starts = []
+        self.origins = []
+        self.length = 0
+
+    def reset(self, origin):
+        """Attribute every line to `origin`."""
+        self.starts, self.origins = ([0], [origin]) if self.length else ([], [])
+
+    def origin(self, line):
+        """Commit id that introduced 1-based `line`."""
+        return self.origins[bisect_right(self.starts, line - 1) - 1]
+
+    def apply(self, hunks, origin):
+        """Rewrite the table through one file diff; new and rewritten lines get `origin`.
+
+        Returns False when the hunks do not fit the table, i.e. the index lost
+        track of this file and must not answer for it.
+        """
+        starts, origins = self.starts, self.origins
+        new_starts, new_origins = [], []
+        position = delta = 0
+
+        def push(start, owner):
+            if new_origins and new_origins[-1] == owner:
+                return
+            new_starts.append(start)
+            new_origins.append(owner)
+
+        def copy(lo, hi):
+            # Old lines [lo, hi) keep their origin and move by `delta`
+            if lo >= hi:
+                return
+            k = bisect_right(starts, lo) - 1
+            push(lo + delta, origins[k])
+            end = bisect_right(starts, hi - 1)
+            if end > k + 1:
+                push(starts[k + 1] + delta, origins[k + 1])
+                new_starts.extend(s + delta for s in starts[k + 2:end])
+                new_origins.extend(origins[k + 2:end])
+
+        for old_start, old_count, _, new_count in hunks:
+            # A pure insertion (count 0) goes after old line `old_start`
+            lo = old_start if old_count == 0 else old_start - 1
+            if lo < position or lo + old_count > self.length:
+                return False
+            copy(position, lo)
+            if new_count:
+                push(lo + delta, origin)
+            delta += new_count - old_count
+            position = lo + old_count
+        copy(position, self.length)
+
+        self.starts, self.origins = new_starts, new_origins
+        self.length += delta
+        return True
+
+class LineOriginIndex:
+    """Which commit introduced each current line of each file, kept up to date
+    by walking the first-parent history once with `git log -p -U0 -M`.
+
+    This answers the question `git blame <fix>^ -L` answers, without a git
+    process per fix. The index gives no answer (None) when it cannot be sure:
+    - Lines a merge brought in. Their origin lies on a side branch the
+      first-parent walk never visited.
+    - Files it lost track of, such as binary ones.
+    Callers blame those lines instead.
+    """
+
+    def __init__(self, repo_path, rev="HEAD", parents=None):
+        self.repo_path = repo_path
+        self.rev = rev
+        self.parents = {} if parents is None else parents
+        self.files = {}
+        self.commits = []       # commit id -> sha
+        self.merges = set()     # ids of merge commits
+
+    def _apply(self, cid, diffs, merge=False):
+        # Detach every source first so swaps and rename chains within a commit work
+        sources = [self.files.pop(d.old_path, None) if d.old_path is not None else LineOrigins() for d in diffs]
+        for diff, table in zip(diffs, sources):
+            if diff.new_path is None or table is None or diff.binary:
+                continue
+            if table.apply(diff.hunks, cid):
+                if merge:
+                    # Blame hands a whole file to any parent holding the identical
+                    # blob, so even its unchanged lines may belong to a side branch
+                    table.reset(cid)
+                self.files[diff.new_path] = table
+
+    def owners(self, path, lines):
+        """Map each line of `path` to the sha that introduced it, or None if unknown."""
+        table = self.files.get(path)
+        result = {}
+        for line in lines:
+            cid = table.origin(line) if table is not None and 0 < line <= table.length else None
+            result[line] = None if cid is None or cid in self.merges else self.commits[cid]
+        return result
+
+    def walk(self, fixes, regions):
+        """Yield (fix, owners) for each fix on the first-parent chain, oldest first.
+
+        `regions(diffs)` picks the {path: lines} to look up from the fix's own
+        diff against its first parent; owners maps path -> {line: sha or None}
+        as of that parent. The walk stops once every fix has been answered.
+        """
+        pending = set(fixes)
+        if not pending:
+            return
+        cmd = ["git", "log", "--first-parent", "--reverse", "-p", "-U0", "-M", "--diff-merges=first-parent",
+               "--no-color", "--no-ext-diff", "--src-prefix=a/", "--dst-prefix=b/", f"--format={LOG_FORMAT}",
+               self.rev, "--"]
+        proc = subprocess.Popen(cmd, cwd=self.repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        def commits():
+            header, body = None, []
+            for raw in proc.stdout:
+                line = raw.decode("utf-8", "surrogateescape").rstrip("\n")
+                if line.startswith(COMMIT_MARK):
+                    if header is not None:
+                        yield header, body
+                    header, body = line[1:].split(), []
+                elif header is not None:
+                    body.append(line)
+            if header is not None:
+                yield header, body
+
+        # True only when git's whole output was read; after a break or an
+        # abandoned generator git is killed, and its exit status means nothing
+        exhausted = False
+        try:
+            for (sha, *parents), body in commits():
+                self.parents[sha] = parents
+                diffs = list(parse_diff(body))
+                if sha in pending:
+                    pending.discard(sha)
+                    wanted = regions(diffs) if parents else {}
+                    yield sha, {path: self.owners(path, lines) for path, lines in wanted.items()}
+                    if not pending:
+                        break
+                cid = len(self.commits)
+                self.commits.append(sha)
+                if len(parents) > 1:
+                    self.merges.add(cid)
+                self._apply(cid, diffs, len(parents) > 1)
+            else:
+                exhausted = True
+        finally:
+            proc.kill()
+            proc.stdout.close()
+            stderr = proc.stderr.read().decode(errors="replace")
+            proc.stderr.close()
+            returncode = proc.wait()
+        if returncode != 0 and exhausted:
+            raise HistoryError(f"git log failed: {stderr.strip()}")
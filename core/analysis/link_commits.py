@@ -1,7 +1,14 @@
-import argparse, json, os, subprocess, sys, functools
+import argparse, asyncio, json, os, subprocess, sys, threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Sequence
 
+from history import HistoryError, add_merge_argument
+from line_origins import LineOriginIndex, parse_diff
+from instrument import add_arguments, instrumented
+from result_cache import open_cache
+from ndjson import write_record, write_records
+
 # ─────────────────────────────  whitelist  ──────────────────────────────
 WHITELISTED_EXT = {
     "ADA","ASM","AS","BAS","BAT","C","CC","CLJ","CPP","CS","CSON","CSS","CXX",
@@ -13,84 +20,405 @@ WHITELISTED_EXT = {
     "SWIFT","TEX","TF","TS","TSX","V","VB","VBA","VBPROJ","VBX","VHD","VHDL"
 }
 
+def whitelisted(path): return os.path.splitext(path)[1][1:].upper() in WHITELISTED_EXT
+
+class GitError(RuntimeError):
+    """A git command failed; raised instead of exiting so callers can report it per fix."""
+
+class GitCommandError(GitError):
+    """git exited non-zero; the arguments, exit status and stderr are kept for callers."""
+    def __init__(self,args,returncode,stderr):
+        super().__init__(f"git {' '.join(args)} failed: {stderr or f'exit status {returncode}'}")
+        self.git_args,self.returncode,self.stderr=list(args),returncode,stderr
+
+class GitTimeout(GitError):
+    """git ran past the per-call timeout and was killed."""
+    def __init__(self,args,timeout):
+        super().__init__(f"git {' '.join(args)} timed out after {timeout}s")
+        self.git_args,self.timeout=list(args),timeout
+
+# Seconds one git call may take before it is killed (None: no limit)
+GIT_TIMEOUT=300
+
 class GitBackend:
-    def __init__(self, repo): 
+    def __init__(self, repo, parents=None, cache=None, timeout=GIT_TIMEOUT):
         if not os.path.isdir(os.path.join(repo, ".git")):
-            sys.exit(f"{repo} is not a git repo")
+            raise GitError(f"{repo} is not a git repo")
         self.repo = os.path.abspath(repo)
+        # sha -> parent shas; callers that already walked history can pass theirs in
+        self.parents = {} if parents is None else parents
+        # persistent ResultCache shared across runs, or None
+        self.cache = cache
+        self.timeout = timeout
+        self._graph_lock = threading.Lock(); self._graph_loaded = False
+        self._persisted = set()  # shas whose parents are known to be in the cache
 
     def _run(self,*a:Sequence[str])->str:
         try:
-            return subprocess.check_output(["git",*a],cwd=self.repo,
-                                           text=True,stderr=subprocess.DEVNULL)
+            # Decoded by hand: text mode would turn a lone CR in blamed content into a line break
+            return subprocess.check_output(["git",*a],cwd=self.repo,stderr=subprocess.PIPE,
+                                           timeout=self.timeout).decode("utf-8","replace")
         except subprocess.CalledProcessError as e:
-            sys.exit(f"git {' '.join(a)} failed: {e}")
+            raise GitCommandError(a,e.returncode,(e.stderr or b"").decode("utf-8","replace").strip()) from e
+        except subprocess.TimeoutExpired as e:
+            raise GitTimeout(a,self.timeout) from e
+
+    def _cached(self,compute,*key):
+        """compute(), memoized in the persistent cache (if any) under key = (kind, sha, ...)."""
+        if self.cache is None: return compute()
+        value=self.cache.get(*key)
+        if value is None: value=compute(); self.cache.put(value,*key)
+        return value
+
+    def _load_graph(self):
+        """Parents of everything reachable from HEAD from one rev-list, instead of one process per commit."""
+        with self._graph_lock:
+            if self._graph_loaded: return
+            try:
+                for line in self._run("rev-list","--parents","HEAD").splitlines():
+                    sha,*parents=line.split(); self.parents.setdefault(sha,parents)
+            except GitError: pass  # no usable HEAD: fall back to one rev-list per commit
+            self._graph_loaded=True
 
-    @functools.lru_cache(maxsize=None)
-    def is_root(self,sha):  return len(self._run("rev-list","--parents","-n","1",sha).split())==1
-    @functools.lru_cache(maxsize=None)
-    def is_merge(self,sha): return len(self._run("rev-list","--parents","-n","1",sha).split())>2
+    def parents_of(self,sha)->List[str]:
+        if sha in self.parents:
+            # Filled by a history walk: persist it too, or the next run walks again to find it
+            if self.cache and sha not in self._persisted:
+                if self.cache.get("parents",sha) is None: self.cache.put(self.parents[sha],"parents",sha)
+                self._persisted.add(sha)
+            return self.parents[sha]
+        cached=self.cache and self.cache.get("parents",sha)
+        if cached is not None: self.parents[sha]=cached; self._persisted.add(sha); return cached
+        if not self._graph_loaded: self._load_graph()
+        if sha not in self.parents:  # not on HEAD: a fix from another branch
+            self.parents[sha]=self._run("rev-list","--parents","-n","1",sha).split()[1:]
+        if self.cache: self.cache.put(self.parents[sha],"parents",sha); self._persisted.add(sha)
+        return self.parents[sha]
+    def is_root(self,sha):  return not self.parents_of(sha)
+    def is_merge(self,sha): return len(self.parents_of(sha))>1
 
     def modified_files(self,commit)->List[str]:
         if self.is_root(commit): return []
-        files=self._run("diff",f"{commit}^",commit,"--name-only").splitlines()
-        return [f for f in files
-                if f and os.path.splitext(f)[1][1:].upper() in WHITELISTED_EXT]
+        files=self._cached(lambda: self._run("diff",f"{commit}^",commit,"--name-only","-z").split("\0"),
+                           "modified",commit)
+        return [f for f in files if f and whitelisted(f)]
 
     def diff_regions(self,commit,files)->Dict[str,List[int]]:
         if self.is_root(commit) or not files: return {}
-        diff=self._run("diff",f"{commit}^",commit,"--unified=0","--",*files).splitlines()
-        regions,cur,old=defaultdict(list),None,None
-        for ln in diff:
-            if ln.startswith("--- "):
-                p=ln[6:] if ln.startswith("--- a/") else ln[4:]
-                if p=="/dev/null": cur=None;continue
-                if p.startswith("a/"): p=p[2:]
-                cur=p if os.path.splitext(p)[1][1:].upper() in WHITELISTED_EXT else None
-                continue
-            if ln.startswith("@@"):
-                old=abs(int(ln.split(" ")[1].split(",")[0]));continue
-            if cur and ln.startswith("-") and not ln.startswith("---"):
-                regions[cur].append(old); old+=1
-        return regions
+        diff=lambda: self._run("diff",f"{commit}^",commit,"--unified=0","--",*files).splitlines()
+        return self._cached(lambda: fix_regions(parse_diff(diff())),"regions",commit,*files)
 
     def blame(self,file,line,fix)->str:
-        out=self._run("blame","-l","--follow","-L",f"{line},+1",f"{fix}^","--",file)
-        return out.split(" ",1)[0].lstrip("^")
+        out=lambda: self._run("blame","-l","--follow","-L",f"{line},+1",f"{fix}^","--",file)
+        return self._cached(lambda: out().split(" ",1)[0].lstrip("^"),"line",fix,file,str(line))
+
+    def blame_lines(self,file,lines,fix)->Dict[int,str]:
+        """Blame all `lines` of `file` at `fix^` in a single git process."""
+        if not lines: return {}
+        ranges=blame_ranges(lines)
+        # Cached as [line, sha] pairs: JSON object keys would come back as strings
+        pairs=self._cached(lambda: list(parse_porcelain(self._run(*blame_args(file,ranges,fix))).items()),
+                           "blame",fix,file,*ranges[1::2])
+        return dict(map(tuple,pairs))
+
+async def kill(proc):
+    try: proc.kill()
+    except ProcessLookupError: pass  # exited on its own meanwhile
+    await proc.wait()
+
+class CatFile:
+    """One long-lived `git cat-file --batch` serving object reads for an AsyncGitBackend."""
+    def __init__(self,repo,timeout=GIT_TIMEOUT):
+        self.repo=repo; self.timeout=timeout; self.proc=None; self.lock=asyncio.Lock()
+    async def read(self,sha)->bytes:
+        args=("cat-file","--batch",sha)
+        async with self.lock:  # the protocol is strictly request, then response
+            try:
+                if self.proc is None:
+                    self.proc=await asyncio.create_subprocess_exec("git","cat-file","--batch",cwd=self.repo,
+                        stdin=asyncio.subprocess.PIPE,stdout=asyncio.subprocess.PIPE,stderr=asyncio.subprocess.DEVNULL)
+                self.proc.stdin.write(f"{sha}\n".encode()); await self.proc.stdin.drain()
+                header=(await asyncio.wait_for(self.proc.stdout.readline(),self.timeout)).split()
+                if len(header)==2:  # "<sha> missing" or "ambiguous": the stream is still in step
+                    raise GitCommandError(args,1,b" ".join(header).decode("utf-8","replace"))
+                if len(header)!=3 or not header[2].isdigit(): raise EOFError(f"unexpected header {header!r}")
+                data=await asyncio.wait_for(self.proc.stdout.readexactly(int(header[2])+1),self.timeout)
+            except asyncio.TimeoutError as e:
+                await self.close()  # mid-response: the stream cannot be resynchronised
+                raise GitTimeout(args,self.timeout) from e
+            except (OSError,EOFError) as e:
+                # cat-file died or went out of step; the next read starts a fresh one
+                proc=self.proc; await self.close()
+                raise GitCommandError(args,proc and proc.returncode or 1,str(e) or type(e).__name__) from e
+            return data[:-1]
+    async def close(self):
+        proc,self.proc=self.proc,None
+        if proc is None: return
+        if proc.returncode is None:
+            proc.stdin.close()
+            try: await asyncio.wait_for(proc.wait(),5)
+            except asyncio.TimeoutError: await kill(proc)
+
+class AsyncGitBackend:
+    """GitBackend's interface as coroutines on asyncio subprocesses.
+
+    At most `concurrency` git processes run at once, each bounded by
+    `timeout`; failures raise GitCommandError/GitTimeout like GitBackend.
+    Parents come from a long-lived cat-file process instead of a rev-list
+    per commit. Shares the parents dict and result cache with the
+    GitBackend it is built from."""
+    def __init__(self,git:GitBackend,concurrency=8):
+        self.git=git; self.repo,self.parents,self.cache,self.timeout=git.repo,git.parents,git.cache,git.timeout
+        self.semaphore=asyncio.Semaphore(concurrency); self.cat_file=CatFile(self.repo,self.timeout)
+
+    async def _run(self,*a)->str:
+        async with self.semaphore:
+            proc=await asyncio.create_subprocess_exec("git",*a,cwd=self.repo,
+                stdout=asyncio.subprocess.PIPE,stderr=asyncio.subprocess.PIPE)
+            try: out,err=await asyncio.wait_for(proc.communicate(),self.timeout)
+            except asyncio.TimeoutError as e:
+                await kill(proc)
+                raise GitTimeout(a,self.timeout) from e
+        if proc.returncode: raise GitCommandError(a,proc.returncode,err.decode("utf-8","replace").strip())
+        return out.decode("utf-8","replace")
+
+    async def _cached(self,compute,*key):
+        if self.cache is None: return await compute()
+        value=self.cache.get(*key)
+        if value is None: value=await compute(); self.cache.put(value,*key)
+        return value
+
+    async def parents_of(self,sha)->List[str]:
+        if sha in self.parents: return self.git.parents_of(sha)  # no git call, and persisted like GitBackend's
+        async def read():
+            header=(await self.cat_file.read(sha)).split(b"\n\n",1)[0].decode("utf-8","replace")
+            return [ln[7:] for ln in header.split("\n") if ln.startswith("parent ")]
+        self.parents[sha]=await self._cached(read,"parents",sha); self.git._persisted.add(sha)
+        return self.parents[sha]
+    async def is_root(self,sha):  return not await self.parents_of(sha)
+    async def is_merge(self,sha): return len(await self.parents_of(sha))>1
+
+    async def modified_files(self,commit)->List[str]:
+        if await self.is_root(commit): return []
+        async def diff(): return (await self._run("diff",f"{commit}^",commit,"--name-only","-z")).split("\0")
+        return [f for f in await self._cached(diff,"modified",commit) if f and whitelisted(f)]
+
+    async def diff_regions(self,commit,files)->Dict[str,List[int]]:
+        if await self.is_root(commit) or not files: return {}
+        async def regions():
+            diff=await self._run("diff",f"{commit}^",commit,"--unified=0","--",*files)
+            return fix_regions(parse_diff(diff.splitlines()))
+        return await self._cached(regions,"regions",commit,*files)
+
+    async def blame(self,file,line,fix)->str:
+        async def owner():
+            out=await self._run("blame","-l","--follow","-L",f"{line},+1",f"{fix}^","--",file)
+            return out.split(" ",1)[0].lstrip("^")
+        return await self._cached(owner,"line",fix,file,str(line))
+
+    async def blame_lines(self,file,lines,fix)->Dict[int,str]:
+        if not lines: return {}
+        ranges=blame_ranges(lines)
+        async def owners(): return list(parse_porcelain(await self._run(*blame_args(file,ranges,fix))).items())
+        return dict(map(tuple,await self._cached(owners,"blame",fix,file,*ranges[1::2])))
+
+    async def close(self): await self.cat_file.close()
+
+def blame_ranges(lines)->List[str]:
+    """-L arguments covering `lines`, one per contiguous run."""
+    ranges=[]
+    for start,end in line_ranges(lines): ranges+=["-L",f"{start},{end}"]
+    return ranges
+
+def blame_args(file,ranges,fix)->List[str]:
+    return ["blame","-l","--porcelain","--follow",*ranges,f"{fix}^","--",file]
+
+def parse_porcelain(out)->Dict[int,str]:
+    """Final line number -> commit from `git blame --porcelain` output."""
+    owners,header={},True
+    for ln in out.split("\n"):
+        if header and ln:
+            sha,_,final=ln.split(" ")[:3]
+            owners[int(final)]=sha; header=False
+        elif ln.startswith("\t"): header=True
+    return owners
+
+def fix_regions(diffs)->Dict[str,List[int]]:
+    """Old-side lines a fix removed or rewrote, per whitelisted file.
+
+    Renames never contribute: `diff --name-only` lists only their new path, so
+    the path-limited diff in diff_regions sees them as additions."""
+    regions=defaultdict(list)
+    for d in diffs:
+        if d.renamed or d.old_path is None or not whitelisted(d.old_path): continue
+        regions[d.old_path]+=d.deleted_lines()
+    return {p:lines for p,lines in regions.items() if lines}
+
+def line_ranges(lines:Sequence[int])->List[tuple]:
+    """Collapse line numbers into sorted, inclusive (start, end) runs."""
+    ranges=[]
+    for ln in sorted(set(lines)):
+        if ranges and ln==ranges[-1][1]+1: ranges[-1][1]=ln
+        else: ranges.append([ln,ln])
+    return [tuple(r) for r in ranges]
+
+ENGINES=("blame","index")
+# threads: blocking git calls on a thread pool; async: one event loop driving AsyncGitBackend
+BACKENDS=("threads","async")
 
 class GitCommitLinker:
-    def __init__(self,repo): self.git=GitBackend(repo)
-    def link(self,fixes:List[str])->Dict[str,List[str]]:
-        mapping:Dict[str,set]=defaultdict(set)
-        for fix in fixes:
-            for bug in self._link_one_fix(fix):
-                if self.git.is_merge(bug):
-                    continue
-                if fix not in mapping[bug]: mapping[bug].add(fix)
+    def __init__(self,repo,batch_blame=True,parents=None,engine="blame",cache=None,merges="all",
+                 backend="threads",timeout=GIT_TIMEOUT):
+        self.git=GitBackend(repo,parents,cache,timeout); self.batch_blame=batch_blame; self.engine=engine
+        self.merges=merges; self.backend=backend
+    def link(self,fixes:List[str],jobs:int=1)->Dict[str,List[str]]:
+        """Map each bug-introducing commit to the fixes that blame it.
+
+        With jobs > 1 fixes are linked on a thread pool (the work is git
+        subprocesses, so threads overlap fine). Results are merged in input
+        order, so the mapping is identical for every worker count. With the
+        "async" backend jobs bounds the git processes in flight instead.
+        Fixes whose git calls fail are skipped and recorded in self.errors.
+        With merges "no-merges", merge fixes are dropped before their
+        (whole-branch) diff.
+        """
+        fixes=list(dict.fromkeys(fixes)); self.errors=[]
+        if self.merges=="no-merges": fixes=[f for f in fixes if not self._merge_fix(f)]
+        indexed=self._index_owners(fixes) if self.engine=="index" else {}
+        work=lambda fix: self._try_link_one_fix(fix,indexed.get(fix))
+        if self.backend=="async": results=asyncio.run(self._link_async(fixes,indexed,jobs))
+        elif jobs>1:
+            with ThreadPoolExecutor(jobs) as pool: results=list(pool.map(work,fixes))
+        else: results=map(work,fixes)
+        mapping:Dict[str,List[str]]=defaultdict(list)
+        for fix,(bugs,err) in zip(fixes,results):
+            if err: self.errors.append({"fix":fix,**err}); continue
+            for bug in bugs:
+                if fix not in mapping[bug]: mapping[bug].append(fix)
+        if self.git.cache: self.git.cache.flush()
         return mapping
-    def _link_one_fix(self,fix)->List[str]:
+    def _index_owners(self,fixes)->Dict[str,Dict[str,Dict[int,str]]]:
+        """Line owners for every fix on HEAD's first-parent chain from one pass
+        over history (see line_origins); lines it cannot answer are None.
+        Fixes answered before come from the cache, with the lines blame
+        resolved since, and fixes off the chain are cached as False, so when
+        every fix is known the history pass is skipped."""
+        cache,owners,off_chain=self.git.cache,{},set()
+        for fix in fixes if cache else ():
+            hit=cache.get("owners",fix)
+            if hit is False: off_chain.add(fix)
+            elif hit is not None: owners[fix]={f:dict(map(tuple,pairs)) for f,pairs in hit.items()}
+        missing=[fix for fix in fixes if fix not in owners and fix not in off_chain]
+        if not missing: return owners
+        index=LineOriginIndex(self.git.repo,parents=self.git.parents)
+        try: walked=dict(index.walk(missing,fix_regions))
+        except HistoryError as e: raise GitError(str(e)) from e
+        for fix in missing if cache else ():
+            if fix in walked: self._cache_owners(fix,walked[fix])
+            else: cache.put(False,"owners",fix)
+        return {**owners,**walked}
+    def _cache_owners(self,fix,owners):
+        if self.git.cache: self.git.cache.put({f:list(o.items()) for f,o in owners.items()},"owners",fix)
+    def _merge_fix(self,fix):
+        try: return self.git.is_merge(fix)
+        except GitError: return False  # unknown commit: left to fail, and be reported, in linking
+    def _try_link_one_fix(self,fix,owners=None):
+        try: return [b for b in self._link_one_fix(fix,owners) if not self.git.is_merge(b)],None
+        except GitError as e: return [],error_record(e)
+    async def _link_async(self,fixes,indexed,jobs):
+        git=AsyncGitBackend(self.git,max(1,jobs))
+        try: return await asyncio.gather(*(self._try_link_one_fix_async(git,f,indexed.get(f)) for f in fixes))
+        finally: await git.close()
+    async def _try_link_one_fix_async(self,git,fix,indexed=None):
+        try:
+            from_index=indexed is not None
+            if indexed is None:
+                regions=await git.diff_regions(fix,await git.modified_files(fix))
+                indexed={f:dict.fromkeys(lines) for f,lines in regions.items()}
+            resolved={}
+            for f,owners in indexed.items():
+                unknown=[ln for ln in owners if owners[ln] is None]
+                if unknown:
+                    if self.batch_blame: found=await git.blame_lines(f,unknown,fix)
+                    else: found=dict(zip(unknown,await asyncio.gather(*(git.blame(f,ln,fix) for ln in unknown))))
+                    owners={**owners,**found}
+                resolved[f]=owners
+            return [b for b in self._culprits(fix,from_index and indexed,resolved) if not await git.is_merge(b)],None
+        except GitError as e: return [],error_record(e)
+    def _blame(self,f,lines,fix)->Dict[int,str]:
+        if self.batch_blame: return self.git.blame_lines(f,lines,fix)
+        return {ln:self.git.blame(f,ln,fix) for ln in lines}
+    def _link_one_fix(self,fix,indexed=None)->List[str]:
+        from_index=indexed is not None
+        if indexed is None:
+            indexed={f:dict.fromkeys(lines) for f,lines in self.git.diff_regions(fix,self.git.modified_files(fix)).items()}
+        resolved={}
+        for f,owners in indexed.items():
+            unknown=[ln for ln in owners if owners[ln] is None]
+            resolved[f]={**owners,**self._blame(f,unknown,fix)} if unknown else owners
+        return self._culprits(fix,from_index and indexed,resolved)
+    def _culprits(self,fix,indexed,resolved)->List[str]:
+        """Owners of every line, first seen first. When some of the index's
+        answer (`indexed`) needed blame, it is cached again with those lines filled in."""
+        if indexed and resolved!=indexed: self._cache_owners(fix,resolved)
         culprits=[]
-        for f,lines in self.git.diff_regions(fix,self.git.modified_files(fix)).items():
-            for ln in lines:
-                sha=self.git.blame(f,ln,fix)
+        for owners in resolved.values():
+            for sha in owners.values():
                 if sha not in culprits: culprits.append(sha)
         return culprits
 
+def error_record(e:GitError)->dict:
+    """The error entry reported for a fix: message, kind, and exit status and stderr when git failed."""
+    rec={"error":str(e),"kind":"timeout" if isinstance(e,GitTimeout) else "git"}
+    if isinstance(e,GitCommandError): rec.update(returncode=e.returncode,stderr=e.stderr)
+    return rec
+
 def load_corrective(p)->List[str]:
     data=json.load(open(p))
-    if data and isinstance(data[0],str): return data
+    if not data or isinstance(data[0],str): return data
     key="commit" if "commit" in data[0] else "hash"
     return [d[key] for d in data]
 
 def main():
     ap=argparse.ArgumentParser()
     ap.add_argument("repo"); ap.add_argument("--corrective",required=True)
-    ap.add_argument("--output",default="links.json")
+    ap.add_argument("--output",help="links file (default: links.json, none with --ndjson)")
+    ap.add_argument("--blame",choices=("batch","line"),default="batch",
+                    help="one blame per (fix, file) or the legacy one blame per line")
+    ap.add_argument("--jobs",type=int,default=1,help="link fixes on N worker threads (async: N git processes)")
+    ap.add_argument("--backend",choices=BACKENDS,default="threads",
+                    help="run git calls on a thread pool, or as asyncio subprocesses on one event loop")
+    ap.add_argument("--git-timeout",type=float,default=GIT_TIMEOUT,
+                    help=f"seconds before a git call is killed and its fix reported as failed, 0 for none "
+                         f"(default {GIT_TIMEOUT})")
+    ap.add_argument("--engine",choices=ENGINES,default="blame",
+                    help="blame every fix, or answer from a line-origin index built in one history pass")
+    ap.add_argument("--ndjson",action="store_true",help="stream one JSON record per link, then a summary")
+    ap.add_argument("--cache",help="result cache file, or off (default: $LINK_CACHE, else next to the "
+                                   "mirror or in .git)")
+    ap.add_argument("--cache-mb",type=int,help="evict least recently used results past this size (default 512)")
+    add_merge_argument(ap)
+    add_arguments(ap)
     a=ap.parse_args()
     fixes=load_corrective(a.corrective)
-    res=[{"buggy_commit":b,"linked_to":list(l)} 
-        for b,l in GitCommitLinker(a.repo).link(fixes).items()]
+    if not os.path.isdir(os.path.join(a.repo,".git")): sys.exit(f"{a.repo} is not a git repo")
+    cache=open_cache(a.repo,a.cache,a.cache_mb)
+    try: linker=GitCommitLinker(a.repo,a.blame=="batch",engine=a.engine,cache=cache,merges=a.merges,
+                                 backend=a.backend,timeout=a.git_timeout or None)
+    except GitError as e: sys.exit(str(e))
+    with instrumented(a.timings,a.profile) as rec, rec.stage("GitCommitLinker.link") as st:
+        res=[{"buggy_commit":b,"linked_to":list(l)}
+            for b,l in linker.link(fixes,a.jobs).items()]
+        st.rows=len(res)
+    for err in linker.errors: print(json.dumps(err),file=sys.stderr)
 
-    json.dump(res,open(a.output,"w"),indent=2); print(json.dumps(res,indent=2))
+    # Parallel --ndjson jobs would all overwrite one default file
+    output=a.output or (None if a.ndjson else "links.json")
+    if output: json.dump(res,open(output,"w"),indent=2)
+    if a.ndjson:
+        write_records(res,"link")
+        write_record({"type":"summary","status":"success","total_links":len(res),
+                      "fixes":len(fixes),"errors":linker.errors})
+    else: print(json.dumps(res,indent=2))
 
 if __name__=="__main__": main()
\ No newline at end of file
@@ -0,0 +1,14 @@
+import json
+import sys
+
+def write_record(record, out=None):
+    """Write one compact JSON object on its own line."""
+    (out or sys.stdout).write(json.dumps(record, separators=(",", ":")) + "\n")
+
+def write_records(records, record_type, out=None):
+    """Stream `records` as they are produced, tagging each with `type`; returns how many were written."""
+    count = 0
+    for record in records:
+        write_record({"type": record_type, **record}, out)
+        count += 1
+    return count
@@ -0,0 +1,129 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Persistent cache for the linker's git answers. Everything it stores is keyed
+# by commit SHA (plus path and lines where needed), and commits are immutable,
+# so an entry never goes stale: the same fix diffs and blames the same way in
+# every job, every process and every fork that shares the commit.
+#
+# Writes are buffered in memory and flushed in one transaction, so linker
+# threads never hold the SQLite write lock while git runs. Several processes
+# can share one file (WAL mode). The file is kept under max_bytes by evicting
+# the least recently used entries.
+
+FILENAME = "linker-cache.sqlite"
+DEFAULT_MAX_MB = 512
+FLUSH_EVERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used ON entries(used);
+"""
+
+def default_path(repo):
+    """The cache file for `repo`: next to its mirror when it borrows objects from one, else in .git."""
+    git_dir = os.path.join(os.path.abspath(repo), ".git")
+    try:
+        with open(os.path.join(git_dir, "objects", "info", "alternates")) as fh:
+            objects = fh.readline().strip()
+    except OSError:
+        objects = ""
+    if objects:
+        objects = os.path.normpath(os.path.join(git_dir, "objects", objects))
+        return os.path.join(os.path.dirname(objects), FILENAME)
+    return os.path.join(git_dir, FILENAME)
+
+def open_cache(repo, path=None, max_mb=None):
+    """The cache for linking `repo`: `path`, else $LINK_CACHE, else default_path(repo).
+
+    "off" disables it. Returns None, with a warning, when the file cannot be opened.
+    """
+    path = path or os.environ.get("LINK_CACHE") or default_path(repo)
+    if path == "off":
+        return None
+    max_mb = max_mb or int(os.environ.get("LINK_CACHE_MB") or DEFAULT_MAX_MB)
+    try:
+        return ResultCache(path, max_mb << 20)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Linker cache disabled: {path}: {e}", file=sys.stderr)
+        return None
+
+class ResultCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_MB << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pending = {}       # key -> JSON text not yet written
+        self.touched = set()    # keys read since the last flush, for LRU order
+        self.hits = self.misses = 0
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def get(self, *key):
+        key = "\0".join(key)
+        with self.lock:
+            value = self.pending.get(key)
+            if value is None:
+                row = self.db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                value = row and row[0]
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.touched.add(key)
+        return json.loads(value)
+
+    def put(self, value, *key):
+        with self.lock:
+            self.pending["\0".join(key)] = json.dumps(value, separators=(",", ":"))
+            full = len(self.pending) >= FLUSH_EVERY
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            touched, self.touched = self.touched - pending.keys(), set()
+            if not pending and not touched:
+                return
+            now = time.time()
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany("INSERT OR REPLACE INTO entries (key, value, size, used) VALUES (?, ?, ?, ?)",
+                                    [(k, v, len(k) + len(v), now) for k, v in pending.items()])
+                self.db.executemany("UPDATE entries SET used = ? WHERE key = ?", [(now, k) for k in touched])
+                if pending:
+                    self._evict()
+                self.db.execute("COMMIT")
+            except sqlite3.Error:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        """Drop the least recently used entries until the cache is back under 90% of max_bytes."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess = total - self.max_bytes * 9 // 10
+        if total <= self.max_bytes or excess <= 0:
+            return
+        victims = []
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.db.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def close(self):
+        self.flush()
+        self.db.close()
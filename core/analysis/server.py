@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingestion"))
+
+from analyze_history import iter_analyzed
+from classify_commits import iter_classified
+from clone import clone_repo, inject_token
+from compute_metrics import iter_log
+from instrument import Recorder
+from link_commits import GIT_TIMEOUT, GitCommitLinker
+from result_cache import open_cache
+
+# Line-delimited JSON-RPC over a Unix socket. A request is
+#   {"id": 1, "method": "analyze", "params": {"job": "..."}}
+# and is answered by zero or more {"id": 1, "record": {...}} lines (the same
+# records the scripts print with --ndjson) followed by exactly one
+# {"id": 1, "result": {...}} or {"id": 1, "error": {"type": ..., "message": ...}}.
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Long-lived analysis server for the worker.")
+    parser.add_argument("--socket", required=True, type=str, help="Unix socket path to listen on")
+    return parser.parse_args()
+
+class Job:
+    """An open repository shared by every stage of one analysis job."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parents = {}       # sha -> parent shas, filled by analyze and reused by link
+        self.linker = None
+        self.cache = None       # linker result cache, opened with the first linker
+
+    def get_linker(self, engine="blame", cache=None):
+        if self.linker is None:
+            self.cache = open_cache(self.path, cache)
+        if self.linker is None or self.linker.engine != engine:
+            self.linker = GitCommitLinker(self.path, parents=self.parents, engine=engine, cache=self.cache)
+        return self.linker
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+class AnalysisService:
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def job(self, params):
+        with self.lock:
+            job = self.jobs.get(params["job"])
+        if job is None:
+            raise ValueError(f"Unknown job: {params['job']}")
+        return job
+
+    def ping(self, params, emit):
+        return {"pid": os.getpid(), "jobs": len(self.jobs)}
+
+    def clone(self, params, emit):
+        url = inject_token(params["url"], params.get("token"))
+        return clone_repo(url, params.get("directory", "."), params.get("branch"),
+                          params.get("cache"), params.get("metadata", False))
+
+    def open(self, params, emit):
+        if not os.path.isdir(params["path"]):
+            raise FileNotFoundError(f"Invalid path: {params['path']}")
+        with self.lock:
+            self.jobs[params["job"]] = Job(params["path"])
+        return {"job": params["job"], "path": params["path"]}
+
+    def close(self, params, emit):
+        with self.lock:
+            job = self.jobs.pop(params["job"], None)
+        if job is not None:
+            job.close()
+        return {"job": params["job"]}
+
+    def analyze(self, params, emit):
+        job = self.job(params)
+        total = corrective = 0
+        for record in iter_analyzed(job.path, params.get("workers", 1), params.get("merges", "all"),
+                                    params.get("checkpoint"), params.get("since_checkpoint", False)):
+            job.parents[record["hash"]] = record["parent_hashes"]
+            corrective += record["classification"] == "Corrective"
+            total += 1
+            emit({"type": "commit", **record})
+        return {"status": "success", "repo_path": job.path, "total_commits": total, "corrective_commits": corrective}
+
+    def classify(self, params, emit):
+        job = self.job(params)
+        total = 0
+        for record in iter_classified(job.path, params.get("engine", "indexed"), params.get("merges", "all")):
+            total += 1
+            emit({"type": "commit", **record})
+        return {"status": "success", "repo_path": job.path, "total_commits": total}
+
+    def metrics(self, params, emit):
+        job = self.job(params)
+        total = 0
+        for record in iter_log(job.path, params.get("checkpoint"), params.get("since_checkpoint", False),
+                               workers=params.get("workers", 1), merges=params.get("merges", "no-merges")):
+            total += 1
+            emit({"type": "metrics", **record})
+        return {"status": "success", "repo_path": job.path, "total_commits": total}
+
+    def link(self, params, emit):
+        job = self.job(params)
+        linker = job.get_linker(params.get("engine", "blame"), params.get("cache"))
+        linker.merges = params.get("merges", "all")
+        linker.backend = params.get("backend", "threads")
+        linker.git.timeout = params.get("timeout", GIT_TIMEOUT) or None
+        fixes = params["fixes"]
+        mapping = linker.link(fixes, params.get("jobs", 1))
+        for bug, linked_to in mapping.items():
+            emit({"type": "link", "buggy_commit": bug, "linked_to": linked_to})
+        return {"status": "success", "total_links": len(mapping), "fixes": len(fixes), "errors": linker.errors}
+
+    METHODS = ("ping", "clone", "open", "close", "analyze", "classify", "metrics", "link")
+
+    # Stage names in the timings a call returns, matching the scripts' --timings
+    STAGES = {"clone": "clone_repo", "analyze": "analyze_history", "classify": "classify_commits",
+              "metrics": "compute_metrics.log", "link": "GitCommitLinker.link"}
+
+    def dispatch(self, method, params, emit):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        if method not in self.STAGES:
+            return getattr(self, method)(params, emit)
+
+        # Subprocess and byte counts are process-wide, so calls running
+        # concurrently on other connections are included in them
+        recorder = Recorder()
+        try:
+            with recorder.stage(self.STAGES[method]) as stage:
+                def counted(record):
+                    stage.rows += 1
+                    emit(record)
+                result = getattr(self, method)(params, counted)
+        except Exception as e:
+            e.timings = recorder.stages  # sent with the error, see Handler
+            raise
+        return {**result, "timings": recorder.stages}
+
+class Handler(socketserver.StreamRequestHandler):
+    def send(self, message):
+        self.wfile.write((json.dumps(message, separators=(",", ":")) + "\n").encode())
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            rid = request.get("id")
+            try:
+                result = self.server.service.dispatch(
+                    request["method"], request.get("params", {}),
+                    lambda record: self.send({"id": rid, "record": record}))
+                self.send({"id": rid, "result": result})
+            except Exception as e:
+                self.send({"id": rid, "error": {"type": type(e).__name__, "message": str(e),
+                                                "timings": getattr(e, "timings", [])}})
+            self.wfile.flush()
+
+class AnalysisServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, Handler)
+        self.service = AnalysisService()
+
+def request(socket_path, method, params=None, on_record=None):
+    """Call one method on a running server; records go to on_record, the result is returned."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({"id": 1, "method": method, "params": params or {}}) + "\n").encode())
+        for line in sock.makefile("rb"):
+            message = json.loads(line)
+            if "record" in message:
+                if on_record:
+                    on_record(message["record"])
+            elif "error" in message:
+                raise RuntimeError(f"{message['error']['type']}: {message['error']['message']}")
+            else:
+                return message["result"]
+    raise RuntimeError("Analysis server closed the connection")
+
+def main():
+    args = arguments()
+    server = AnalysisServer(args.socket)
+    print(json.dumps({"status": "ready", "socket": args.socket, "pid": os.getpid()}), flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
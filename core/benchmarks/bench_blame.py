@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from link_commits import GitCommitLinker
+from synthetic_repo import generate
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Compare per-line and batched blame in the SZZ linker.")
+    parser.add_argument("-p", type=str, help="Existing repository (default: generate a synthetic one)")
+    parser.add_argument("--commits", type=int, default=2000, help="Commits in the synthetic repository")
+    parser.add_argument("--fixes", type=int, default=200, help="Number of fix commits to link")
+    return parser.parse_args()
+
+def run(repo_path, fixes, batch_blame):
+    linker = GitCommitLinker(repo_path, batch_blame)
+    calls = []
+    run_git = linker.git._run
+    linker.git._run = lambda *a: calls.append(a[0]) or run_git(*a)
+
+    start = time.perf_counter()
+    mapping = linker.link(fixes)
+    elapsed = time.perf_counter() - start
+
+    links = {bug: sorted(fx) for bug, fx in mapping.items()}
+    return links, {
+        "mode": "batch" if batch_blame else "line",
+        "seconds": round(elapsed, 3),
+        "git_processes": len(calls),
+        "blame_processes": calls.count("blame"),
+        "links": len(links),
+    }
+
+def main():
+    args = arguments()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = args.p or generate(os.path.join(tmp, "repo"), commits=args.commits)
+        log = os.popen(f"git -C {repo_path} log --format=%H%x09%s").read().splitlines()
+        fixes = [sha for sha, subject in (ln.split("\t", 1) for ln in log) if "fix" in subject][:args.fixes]
+
+        line_links, line_stats = run(repo_path, fixes, batch_blame=False)
+        batch_links, batch_stats = run(repo_path, fixes, batch_blame=True)
+
+    # Boundary commits are reported with a truncated hash by `git blame -l`,
+    # so compare on the common prefix.
+    same = {b[:39]: v for b, v in line_links.items()} == {b[:39]: v for b, v in batch_links.items()}
+    print(json.dumps({
+        "fixes": len(fixes),
+        "identical_links": same,
+        "line": line_stats,
+        "batch": batch_stats,
+        "speedup": round(line_stats["seconds"] / max(batch_stats["seconds"], 1e-9), 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
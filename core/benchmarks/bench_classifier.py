@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from classify_commits import HARDCODED_CATEGORIES, Classifier
+from history import walk_history
+
+FILLER = ["the", "parser", "for", "when", "module", "user", "api", "config", "handler", "in", "on",
+          "layout", "query", "route", "server", "client", "cache", "path", "widget", "token"]
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Check classifier engine parity and measure throughput.")
+    parser.add_argument("-p", type=str, help="Also classify the messages of this repository")
+    parser.add_argument("--messages", type=int, default=20000, help="Synthetic messages to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    return parser.parse_args()
+
+def _typo(word, rnd):
+    i = rnd.randrange(len(word))
+    kind = rnd.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rnd.choice(string.ascii_lowercase) + word[i + 1:]
+    return word[:i] + rnd.choice(string.ascii_lowercase) + word[i:]
+
+def synthetic_messages(count, seed=0):
+    """Commit-like messages mixing keywords, misspelt keywords and unrelated words."""
+    rnd = random.Random(seed)
+    keywords = [kw for kws in HARDCODED_CATEGORIES.values() for kw in kws]
+    messages = []
+    for _ in range(count):
+        words = [rnd.choice(FILLER) for _ in range(rnd.randint(2, 12))]
+        roll = rnd.random()
+        if roll < 0.4:
+            words.insert(rnd.randrange(len(words)), rnd.choice(keywords) + rnd.choice(["", "s", "ed", "ing"]))
+        elif roll < 0.7:
+            words.insert(rnd.randrange(len(words)), _typo(rnd.choice(keywords), rnd))
+        if rnd.random() < 0.2:
+            words[0] = words[0].capitalize()
+        messages.append(" ".join(words))
+    return messages
+
+def throughput(classifier, messages):
+    start = time.perf_counter()
+    labels = [classifier.classify(m) for m in messages]
+    elapsed = time.perf_counter() - start
+    return labels, round(len(messages) / max(elapsed, 1e-9))
+
+def main():
+    args = arguments()
+    messages = synthetic_messages(args.messages, args.seed)
+    if args.p:
+        messages += [c["message"] for c in walk_history(args.p, numstat=False)]
+
+    fuzzy, fuzzy_rate = throughput(Classifier("fuzzy"), messages)
+    indexed, indexed_rate = throughput(Classifier("indexed"), messages)
+
+    start = time.perf_counter()
+    batch = [r["classification"] for r in Classifier().classify_batch(messages)]
+    batch_rate = round(len(messages) / max(time.perf_counter() - start, 1e-9))
+
+    mismatches = [{"message": m, "fuzzy": f, "indexed": i, "batch": b}
+                  for m, f, i, b in zip(messages, fuzzy, indexed, batch) if not f == i == b]
+
+    print(json.dumps({
+        "messages": len(messages),
+        "parity": not mismatches,
+        "mismatches": mismatches[:20],
+        "fuzzy_messages_per_second": fuzzy_rate,
+        "indexed_messages_per_second": indexed_rate,
+        "batch_messages_per_second": batch_rate,
+        "speedup": round(indexed_rate / max(fuzzy_rate, 1), 2),
+    }, indent=2))
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ingestion"))
+
+from extract_commits import extract_commits
+from synthetic_repo import generate
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Compare bulk numstat extraction with per-commit commit.stats.")
+    parser.add_argument("-p", type=str, help="Existing repository (default: generate a synthetic one)")
+    parser.add_argument("--commits", type=int, default=20000, help="Commits in the synthetic repository")
+    parser.add_argument("--bulk-only", action="store_true", help="Skip the slow per-commit path")
+    return parser.parse_args()
+
+def run(repo_path, per_commit_stats):
+    start = time.perf_counter()
+    output = extract_commits(repo_path, per_commit_stats)
+    elapsed = time.perf_counter() - start
+    return output["commits"], {
+        "mode": "per_commit" if per_commit_stats else "bulk",
+        "seconds": round(elapsed, 3),
+        "commits_per_second": round(len(output["commits"]) / max(elapsed, 1e-9)),
+    }
+
+def main():
+    args = arguments()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = args.p or generate(os.path.join(tmp, "repo"), commits=args.commits)
+        bulk, bulk_stats = run(repo_path, per_commit_stats=False)
+        report = {"commits": len(bulk), "bulk": bulk_stats}
+        if not args.bulk_only:
+            legacy, legacy_stats = run(repo_path, per_commit_stats=True)
+            report["per_commit"] = legacy_stats
+            report["identical_output"] = bulk == legacy
+            report["speedup"] = round(legacy_stats["seconds"] / max(bulk_stats["seconds"], 1e-9), 2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from link_commits import GitCommitLinker
+from synthetic_repo import generate
+
+# History shapes the two engines must agree on: (name, rename_rate, merge_rate)
+SHAPES = [("linear", 0.0, 0.0), ("renames", 0.05, 0.0), ("merges", 0.0, 0.1), ("merges+renames", 0.05, 0.1)]
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Compare blame-based linking with the line-origin index.")
+    parser.add_argument("-p", type=str, help="Existing repository (default: generate synthetic ones)")
+    parser.add_argument("--commits", type=str, default="500,1000,2000,4000",
+                        help="Comma-separated synthetic history lengths")
+    parser.add_argument("--shapes", type=str, default=",".join(name for name, _, _ in SHAPES),
+                        help="Comma-separated history shapes to generate: "
+                             + ", ".join(name for name, _, _ in SHAPES))
+    parser.add_argument("--fix-share", type=float, default=1.0, help="Share of the fix commits to link")
+    return parser.parse_args()
+
+def run(repo_path, fixes, engine):
+    linker = GitCommitLinker(repo_path, engine=engine)
+    calls = []
+    run_git = linker.git._run
+    linker.git._run = lambda *a: calls.append(a[0]) or run_git(*a)
+
+    start = time.perf_counter()
+    mapping = linker.link(fixes)
+    elapsed = time.perf_counter() - start
+
+    links = {bug: sorted(fx) for bug, fx in mapping.items()}
+    return links, {
+        "seconds": round(elapsed, 3),
+        "blame_processes": calls.count("blame"),
+        "links": len(links),
+    }
+
+def compare(repo_path, fix_share):
+    log = subprocess.check_output(["git", "log", "--format=%H%x09%s"], cwd=repo_path, text=True).splitlines()
+    fixes = [sha for sha, subject in (ln.split("\t", 1) for ln in log) if "fix" in subject.lower()]
+    fixes = fixes[:max(1, int(len(fixes) * fix_share))]
+
+    blame_links, blame_stats = run(repo_path, fixes, "blame")
+    index_links, index_stats = run(repo_path, fixes, "index")
+    return {
+        "commits": len(log),
+        "fixes": len(fixes),
+        "identical_links": blame_links == index_links,
+        "blame": blame_stats,
+        "index": index_stats,
+        "speedup": round(blame_stats["seconds"] / max(index_stats["seconds"], 1e-9), 2),
+    }
+
+def main():
+    args = arguments()
+    if args.p:
+        reports = [compare(args.p, args.fix_share)]
+    else:
+        reports = []
+        with tempfile.TemporaryDirectory() as tmp:
+            shapes = [shape for shape in SHAPES if shape[0] in args.shapes.split(",")]
+            for commits in (int(n) for n in args.commits.split(",")):
+                for name, rename_rate, merge_rate in shapes:
+                    repo_path = generate(os.path.join(tmp, f"repo-{name}-{commits}"), commits=commits,
+                                         rename_rate=rename_rate, merge_rate=merge_rate)
+                    reports.append({"shape": name, **compare(repo_path, args.fix_share)})
+    print(json.dumps(reports, indent=2))
+    if not all(r["identical_links"] for r in reports):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
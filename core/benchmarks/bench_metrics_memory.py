@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from compute_metrics import STATE_BACKENDS
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Peak RSS of the compute_metrics state backends against path count.")
+    parser.add_argument("--paths", type=str, default="10000,100000,500000", help="Comma-separated path counts")
+    parser.add_argument("--authors", type=int, default=500, help="Distinct authors")
+    parser.add_argument("--files-per-commit", type=int, default=10, help="Files touched per commit")
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "PATHS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def synthetic_commits(paths, authors, files_per_commit, seed=0):
+    """walk_history-shaped records: every path is created once, then touched again at random."""
+    rnd = random.Random(seed)
+    created = 0
+    for i in range(2 * paths // files_per_commit):
+        files = []
+        for _ in range(files_per_commit):
+            if created < paths and (i % 2 == 0 or created == 0):
+                pid, created = created, created + 1
+            else:
+                pid = rnd.randrange(created)
+            files.append({"path": f"module{pid % 97}/pkg{pid % 1013}/file{pid}.py", "old_path": None,
+                          "added": rnd.randrange(1, 50), "deleted": rnd.randrange(0, 20), "binary": False})
+        yield {"hash": f"{i:040x}", "parents": [f"{i - 1:040x}"] if i else [],
+               "author_name": f"dev{int(rnd.paretovariate(1.2)) % authors}",
+               "author_timestamp": 1_500_000_000 + i * 600, "files": files}
+
+def child(backend, paths, authors, files_per_commit):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    state = STATE_BACKENDS[backend]()
+    start = time.perf_counter()
+    commits = 0
+    for commit in synthetic_commits(paths, authors, files_per_commit):
+        state.update(commit)
+        commits += 1
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "backend": backend,
+        "paths": paths,
+        "commits": commits,
+        "peak_rss_mb": round(peak / 1024, 1),
+        "state_rss_mb": round((peak - baseline) / 1024, 1),
+        "commits_per_second": round(commits / max(elapsed, 1e-9)),
+    }))
+
+def main():
+    args = arguments()
+    if args.child:
+        child(args.child[0], int(args.child[1]), args.authors, args.files_per_commit)
+        return
+
+    rows = []
+    for paths in (int(n) for n in args.paths.split(",")):
+        for backend in STATE_BACKENDS:
+            # A fresh interpreter per run so one backend's peak cannot hide the other's
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", backend, str(paths), "--authors", str(args.authors),
+                 "--files-per-commit", str(args.files_per_commit)],
+                capture_output=True, text=True, check=True).stdout
+            rows.append(json.loads(output))
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from compute_metrics import iter_log
+from synthetic_repo import generate
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Metrics throughput of the serial walk against the chunked process pool.")
+    parser.add_argument("-p", type=str, help="Existing repository (default: generate a synthetic one)")
+    parser.add_argument("--commits", type=int, default=10000, help="Commits in the synthetic repository")
+    parser.add_argument("--workers", type=str, default="1,2,4,8", help="Comma-separated worker counts")
+    return parser.parse_args()
+
+def run(repo_path, workers):
+    start = time.perf_counter()
+    records = list(iter_log(repo_path, workers=workers))
+    elapsed = time.perf_counter() - start
+    return records, {
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "commits_per_second": round(len(records) / max(elapsed, 1e-9)),
+    }
+
+def main():
+    args = arguments()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = args.p or generate(os.path.join(tmp, "repo"), commits=args.commits)
+        serial, serial_stats = run(repo_path, 1)
+        report = {"commits": len(serial), "cpus": os.cpu_count(), "runs": [serial_stats], "identical_output": True}
+        for workers in (int(n) for n in args.workers.split(",")):
+            if workers == 1:
+                continue
+            records, stats = run(repo_path, workers)
+            stats["speedup"] = round(serial_stats["seconds"] / max(stats["seconds"], 1e-9), 2)
+            report["runs"].append(stats)
+            report["identical_output"] &= records == serial
+    print(json.dumps(report, indent=2))
+    if not report["identical_output"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
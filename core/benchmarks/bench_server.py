@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ANALYSIS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis")
+sys.path.insert(0, ANALYSIS)
+
+from server import AnalysisServer, request
+from synthetic_repo import generate
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Compare per-step Python processes with calls to the analysis server.")
+    parser.add_argument("-p", type=str, help="Existing repository (default: generate a synthetic one)")
+    parser.add_argument("--commits", type=int, default=200, help="Commits in the synthetic repository")
+    parser.add_argument("--runs", type=int, default=5, help="Jobs to run in each mode")
+    return parser.parse_args()
+
+def script_job(repo_path, tmp):
+    """One job as the worker ran it before: a fresh interpreter per step.
+
+    The linker's result cache is off in both modes, or every run after the
+    first would be answered from it without a git call.
+    """
+    output = subprocess.run(
+        [sys.executable, os.path.join(ANALYSIS, "analyze_history.py"), "-p", repo_path, "--ndjson"],
+        capture_output=True, text=True, check=True).stdout
+    records = [json.loads(line) for line in output.splitlines()]
+    corrective = [r["hash"] for r in records if r.get("classification") == "Corrective"]
+    fixes_path = os.path.join(tmp, "corrective.json")
+    with open(fixes_path, "w") as f:
+        json.dump(corrective, f)
+    output = subprocess.run(
+        [sys.executable, os.path.join(ANALYSIS, "link_commits.py"), repo_path, "--corrective", fixes_path,
+         "--cache", "off", "--ndjson"],
+        capture_output=True, text=True, check=True).stdout
+    links = [json.loads(line) for line in output.splitlines()]
+    return sorted((l["buggy_commit"], l["linked_to"]) for l in links if l["type"] == "link")
+
+def server_job(socket_path, repo_path, job):
+    """The same job as a sequence of calls to one running server."""
+    request(socket_path, "open", {"job": job, "path": repo_path})
+    records = []
+    request(socket_path, "analyze", {"job": job}, records.append)
+    corrective = [r["hash"] for r in records if r["classification"] == "Corrective"]
+    links = []
+    request(socket_path, "link", {"job": job, "fixes": corrective, "cache": "off"}, links.append)
+    request(socket_path, "close", {"job": job})
+    return sorted((l["buggy_commit"], l["linked_to"]) for l in links)
+
+def timed(fn, runs):
+    samples = []
+    result = None
+    for i in range(runs):
+        start = time.perf_counter()
+        result = fn(i)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return result, {
+        "median_seconds": round(samples[len(samples) // 2], 3),
+        "min_seconds": round(samples[0], 3),
+    }
+
+def main():
+    args = arguments()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_path = args.p or generate(os.path.join(tmp, "repo"), commits=args.commits)
+        socket_path = os.path.join(tmp, "analysis.sock")
+        server = AnalysisServer(socket_path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            script_links, script_stats = timed(lambda i: script_job(repo_path, tmp), args.runs)
+            server_links, server_stats = timed(lambda i: server_job(socket_path, repo_path, f"bench-{i}"), args.runs)
+        finally:
+            server.shutdown()
+            server.server_close()
+        report = {
+            "runs": args.runs,
+            "scripts": script_stats,
+            "server": server_stats,
+            "identical_links": script_links == server_links,
+            "speedup": round(script_stats["median_seconds"] / max(server_stats["median_seconds"], 1e-9), 2),
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
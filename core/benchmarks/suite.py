@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_repo import generate
+
+CORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# generate() arguments per profile; fixed seeds keep every run on the same history
+PROFILES = {
+    "small": {"commits": 500, "files": 50, "authors": 8, "rename_rate": 0.02, "hunk_size": 5, "fix_ratio": 0.3},
+    "medium": {"commits": 5000, "files": 300, "authors": 40, "rename_rate": 0.02, "hunk_size": 8, "fix_ratio": 0.3},
+    "large": {"commits": 20000, "files": 1000, "authors": 150, "rename_rate": 0.01, "hunk_size": 10, "fix_ratio": 0.25},
+}
+
+# Entry point name -> script and arguments; {repo}, {corrective} and {work} are filled in per run.
+# The linker cache is off: otherwise every run after the first is answered from it.
+ENTRY_POINTS = {
+    "extract_commits": ["ingestion/extract_commits.py", "-p", "{repo}", "--ndjson"],
+    "classify_commits": ["analysis/classify_commits.py", "-p", "{repo}", "--ndjson"],
+    "compute_metrics": ["analysis/compute_metrics.py", "-p", "{repo}", "--ndjson"],
+    "analyze_history": ["analysis/analyze_history.py", "-p", "{repo}", "--ndjson"],
+    "link_commits.blame": ["analysis/link_commits.py", "{repo}", "--corrective", "{corrective}",
+                           "--output", "{work}/links.json", "--engine", "blame", "--cache", "off", "--ndjson"],
+    "link_commits.index": ["analysis/link_commits.py", "{repo}", "--corrective", "{corrective}",
+                           "--output", "{work}/links.json", "--engine", "index", "--cache", "off", "--ndjson"],
+}
+
+# What counts as a regression in --compare: relative change past the threshold in the bad direction
+HIGHER_IS_BETTER = {"rows_per_second": True, "peak_rss_mb": False, "subprocesses": False}
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Run the analysis entry points on synthetic repositories and "
+                                                 "record throughput, memory and subprocess counts.")
+    parser.add_argument("--profiles", type=str, default="small,medium", help=f"Comma-separated, from {', '.join(PROFILES)}")
+    parser.add_argument("--entries", type=str, default=",".join(ENTRY_POINTS), help="Comma-separated entry points")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point; the fastest is kept")
+    parser.add_argument("--work", type=str, help="Directory for generated repositories, reused across runs "
+                                                 "(default: a temporary directory)")
+    parser.add_argument("-o", "--output", type=str, default="bench-results.json", help="Results file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare two results files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change flagged as a regression")
+    return parser.parse_args()
+
+def repository(work, profile):
+    params = PROFILES[profile]
+    path = os.path.join(work, "-".join([profile] + [f"{k}{v}" for k, v in sorted(params.items())]))
+    if not os.path.isdir(os.path.join(path, ".git")):
+        generate(path, **params)
+    return path
+
+def corrective_commits(repo_path, work):
+    """Fixes for the linker, as the worker picks them: what the classifier calls Corrective."""
+    output = subprocess.run([sys.executable, os.path.join(CORE, "analysis/classify_commits.py"), "-p", repo_path,
+                             "--ndjson"], capture_output=True, text=True, check=True).stdout
+    records = (json.loads(line) for line in output.splitlines() if line)
+    fixes = [r["hash"] for r in records if r.get("type") == "commit" and r["classification"] == "Corrective"]
+    path = os.path.join(work, "corrective.json")
+    with open(path, "w") as fh:
+        json.dump(fixes, fh)
+    return path
+
+def run_entry(entry, repo_path, corrective, work):
+    timings = os.path.join(work, "timings.json")
+    script, *args = (a.format(repo=repo_path, corrective=corrective, work=work) for a in ENTRY_POINTS[entry])
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(CORE, script), *args, "--timings", timings],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    elapsed = time.perf_counter() - start
+    with open(timings) as fh:
+        stage = json.load(fh)[0]
+    return {
+        "process_seconds": round(elapsed, 3),
+        "wall_ms": stage["wall_ms"],
+        "rows": stage["rows"],
+        "rows_per_second": round(stage["rows"] / max(stage["wall_ms"] / 1000, 1e-9)),
+        "subprocesses": stage["subprocesses"],
+        "bytes_read": stage["bytes_read"],
+        "peak_rss_mb": stage["peak_rss_mb"],
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=CORE, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(profiles, entries, repeat, work):
+    results = []
+    for profile in profiles:
+        repo_path = repository(work, profile)
+        corrective = corrective_commits(repo_path, work)
+        for entry in entries:
+            runs = [run_entry(entry, repo_path, corrective, work) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r["wall_ms"])
+            results.append({"profile": profile, "entry": entry, **best})
+            print(f"{profile:8} {entry:20} {best['wall_ms']:>10.1f} ms {best['rows_per_second']:>9}/s "
+                  f"{best['peak_rss_mb']:>7.1f} MB {best['subprocesses']:>6} procs", file=sys.stderr)
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "profiles": {p: PROFILES[p] for p in profiles},
+        "results": results,
+    }
+
+def compare(base, head, threshold):
+    """Pair results by (profile, entry) and flag metrics that moved past `threshold` the wrong way."""
+    before = {(r["profile"], r["entry"]): r for r in base["results"]}
+    rows = []
+    for r in head["results"]:
+        old = before.get((r["profile"], r["entry"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in HIGHER_IS_BETTER.items():
+            if not old[metric]:
+                continue
+            change = (r[metric] - old[metric]) / old[metric]
+            rows.append({
+                "profile": r["profile"],
+                "entry": r["entry"],
+                "metric": metric,
+                "base": old[metric],
+                "head": r[metric],
+                "change": round(change, 3),
+                "regression": (-change if higher_is_better else change) > threshold,
+            })
+    return rows
+
+def main():
+    args = arguments()
+    if args.compare:
+        with open(args.compare[0]) as fh:
+            base = json.load(fh)
+        with open(args.compare[1]) as fh:
+            head = json.load(fh)
+        rows = compare(base, head, args.threshold)
+        for r in rows:
+            flag = "REGRESSION" if r["regression"] else ""
+            print(f"{r['profile']:8} {r['entry']:20} {r['metric']:16} {r['base']:>12} -> {r['head']:>12} "
+                  f"{r['change']:+8.1%} {flag}")
+        if any(r["regression"] for r in rows):
+            sys.exit(1)
+        return
+
+    profiles = args.profiles.split(",")
+    entries = args.entries.split(",")
+    unknown = [p for p in profiles if p not in PROFILES] + [e for e in entries if e not in ENTRY_POINTS]
+    if unknown:
+        sys.exit(f"Unknown profiles or entry points: {', '.join(unknown)}")
+
+    if args.work:
+        os.makedirs(args.work, exist_ok=True)
+        report = run_suite(profiles, entries, args.repeat, args.work)
+    else:
+        with tempfile.TemporaryDirectory() as work:
+            report = run_suite(profiles, entries, args.repeat, work)
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(args.output)
+
+if __name__ == "__main__":
+    main()
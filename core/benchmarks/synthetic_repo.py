@@ -0,0 +1,148 @@
+import argparse
+import os
+import random
+import subprocess
+
+EPOCH = 1500000000
+
+FIX_MESSAGES = ["fix crash in parser", "bug: wrong offset", "resolve issue with cache", "patch broken build"]
+OTHER_MESSAGES = ["add new option", "refactor helpers", "update readme", "implement export", "tidy imports"]
+
+def arguments():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic Git repository.")
+    parser.add_argument("-d", required=True, type=str, help="Directory to create the repository in")
+    parser.add_argument("--commits", type=int, default=1000, help="Number of commits")
+    parser.add_argument("--files", type=int, default=50, help="Number of source files")
+    parser.add_argument("--authors", type=int, default=8, help="Number of distinct authors")
+    parser.add_argument("--fix-ratio", type=float, default=0.3, help="Share of commits with a fix message")
+    parser.add_argument("--rename-rate", type=float, default=0.0, help="Share of commits that rename a file they touch")
+    parser.add_argument("--merge-rate", type=float, default=0.0,
+                        help="Share of commits that open a side branch merged back later")
+    parser.add_argument("--hunk-size", type=int, default=5, help="Largest number of lines one hunk replaces")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    return parser.parse_args()
+
+def _blob(lines):
+    data = "".join(f"{ln}\n" for ln in lines).encode()
+    return b"data %d\n%s\n" % (len(data), data)
+
+def _edit(rnd, contents, name, n, hunk_size):
+    """Apply one to four random hunks to the file's lines, creating it when empty."""
+    lines = contents.setdefault(name, [])
+    if not lines:
+        lines.extend(f"line {n}.{i}" for i in range(rnd.randint(20, 60)))
+        return
+    for _ in range(rnd.randint(1, 4)):
+        at = rnd.randrange(len(lines))
+        size = rnd.randint(1, hunk_size)
+        lines[at:at + size] = [f"line {n}.{at}.{k}" for k in range(rnd.randint(0, size + 2))]
+        if not lines:
+            lines.append(f"line {n}")
+
+def generate(path, commits=1000, files=50, authors=8, fix_ratio=0.3, seed=0, rename_rate=0.0, hunk_size=5,
+             merge_rate=0.0):
+    """Write a repository with `commits` commits touching `files` Python files.
+
+    Each touched file gets one to four hunks replacing up to `hunk_size` lines,
+    and a `rename_rate` share of commits also moves one of the files they edit.
+    History is linear unless `merge_rate` is set: then that share of commits
+    opens a side branch of one to four commits, interleaved with mainline
+    commits and merged back with --no-ff. The branch edits (and renames) only
+    odd-numbered files and the mainline only even ones meanwhile, so merges
+    never conflict but both parents carry changes. The same arguments always
+    produce the same history, hashes included, so benchmark runs are
+    comparable across machines.
+    """
+    rnd = random.Random(seed)
+    subprocess.run(["git", "init", "-q", path], check=True)
+    contents = {}
+    names = [f"src/pkg{i % 7}/module_{i}.py" for i in range(files)]
+    stream = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=path, stdin=subprocess.PIPE)
+    side = None  # open branch: {"names", "contents", "left", "tip", "start"}
+    master_tip = None
+
+    for n in range(commits):
+        author = rnd.randrange(authors)
+        when = EPOCH + n * 3600
+        if n == 0:
+            message = "initial import"
+        elif rnd.random() < fix_ratio:
+            message = rnd.choice(FIX_MESSAGES)
+        else:
+            message = rnd.choice(OTHER_MESSAGES)
+        ident = b"Dev %d <dev%d@example.com> %d +0000" % (author, author, when)
+        header = b"mark :%d\nauthor %s\ncommitter %s\n" % (n + 1, ident, ident)
+
+        if side is not None and side["left"] == 0:
+            # Merge: the branch's odd files replace the mainline's
+            msg = f"Merge branch 'side' ({message})".encode()
+            ops = []
+            for i in range(1, files, 2):
+                old, new = names[i], side["names"][i]
+                if old != new:
+                    ops.append(b"D %s\n" % old.encode())
+                if old != new or side["contents"][new] != contents[old]:
+                    ops.append(b"M 100644 inline %s\n%s" % (new.encode(), _blob(side["contents"][new])))
+                names[i] = new
+                contents[new] = contents.pop(old) if old != new else contents[old]
+                contents[new][:] = side["contents"][new]
+            stream.stdin.write(b"commit refs/heads/master\n" + header + b"data %d\n%s\n" % (len(msg), msg)
+                               + b"from :%d\nmerge :%d\n" % (master_tip, side["tip"]) + b"".join(ops) + b"\n")
+            master_tip, side = n + 1, None
+            continue
+
+        branch_names, branch_contents, ref, indices = names, contents, b"master", range(files)
+        if merge_rate and n > 0:
+            if side is None and rnd.random() < merge_rate:
+                side = {"names": list(names), "contents": {k: list(v) for k, v in contents.items()},
+                        "left": rnd.randint(1, 4), "tip": None, "start": master_tip}
+                on_side = True
+            else:
+                on_side = side is not None and rnd.random() < 0.5
+            if on_side:
+                branch_names, branch_contents, ref = side["names"], side["contents"], b"side"
+                indices = range(1, files, 2)
+            elif side is not None:
+                indices = range(0, files, 2)
+
+        pool = [branch_names[i] for i in indices]
+        touched = pool if n == 0 else rnd.sample(pool, min(len(pool), rnd.randint(1, 3)))
+        ops = []
+        for name in touched:
+            _edit(rnd, branch_contents, name, n, hunk_size)
+            ops.append(b"M 100644 inline %s\n%s" % (name.encode(), _blob(branch_contents[name])))
+
+        # Only draw when renames are on, so rename_rate=0 keeps the original histories
+        if n > 0 and rename_rate and rnd.random() < rename_rate:
+            old = touched[0]
+            at = branch_names.index(old)
+            new = f"src/pkg{rnd.randrange(7)}/module_{at}_r{n}.py"
+            branch_names[at] = new
+            branch_contents[new] = branch_contents.pop(old)
+            ops[0] = b"D %s\nM 100644 inline %s\n%s" % (old.encode(), new.encode(), _blob(branch_contents[new]))
+
+        msg = message.encode()
+        parent = b""
+        if ref == b"side":
+            parent = b"from :%d\n" % (side["tip"] or side["start"])
+            side["tip"] = n + 1
+            side["left"] -= 1
+        else:
+            master_tip = n + 1
+        stream.stdin.write(b"commit refs/heads/%s\n" % ref + header + b"data %d\n%s\n" % (len(msg), msg)
+                           + parent + b"".join(ops) + b"\n")
+
+    stream.stdin.close()
+    if stream.wait() != 0:
+        raise RuntimeError("git fast-import failed")
+    subprocess.run(["git", "checkout", "-q", "-f", "master"], cwd=path, check=True)
+    subprocess.run(["git", "branch", "-q", "-D", "side"], cwd=path, capture_output=True)
+    return os.path.abspath(path)
+
+def main():
+    args = arguments()
+    print(generate(args.d, args.commits, args.files, args.authors, args.fix_ratio, args.seed,
+                   args.rename_rate, args.hunk_size, args.merge_rate))
+
+if __name__ == "__main__":
+    main()
@@ -57,6 +57,11 @@ CREATE TABLE commits (
     created_at TIMESTAMP DEFAULT NOW() -- Date when the commit was ingested
 );
 
+-- Commit list pages: filtered by repository and date or classification, newest first
+CREATE INDEX idx_commits_repo_authored ON commits(repository_id, authored_date);
+CREATE INDEX idx_commits_repo_classification ON commits(repository_id, classification);
+CREATE INDEX idx_commits_repo_recent ON commits(repository_id, (COALESCE(authored_date, committed_date)) DESC NULLS LAST);
+
 CREATE TABLE feedback (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     user_id UUID REFERENCES users(id) ON DELETE SET NULL,
@@ -99,6 +104,44 @@ CREATE TABLE glm_coefficients (
     UNIQUE(repository_id, model_version, feature_name)
 );
 
+-- Per-repository rollups rebuilt by the worker after each analysis (persist.refreshRollups).
+-- period is the first day of a month, or '-infinity' for the whole history.
+CREATE TABLE commit_rollups (
+    repository_id UUID REFERENCES repositories(id) ON DELETE CASCADE,
+    period DATE NOT NULL,
+    classification TEXT NOT NULL, -- '' for unclassified commits
+    commits INTEGER NOT NULL,
+    bug_inducing INTEGER NOT NULL, -- commits with contains_bug
+    PRIMARY KEY (repository_id, period, classification)
+);
+
+CREATE TABLE metric_rollups (
+    repository_id UUID REFERENCES repositories(id) ON DELETE CASCADE,
+    period DATE NOT NULL,
+    metric TEXT NOT NULL, -- "la", "entropy", ...
+    commits INTEGER NOT NULL,
+    mean FLOAT,
+    p50 FLOAT,
+    p90 FLOAT,
+    p99 FLOAT,
+    PRIMARY KEY (repository_id, period, metric)
+);
+
+CREATE TABLE job_stage_timings (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID REFERENCES jobs(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL, -- "clone_repo", "GitCommitLinker.link", "db.storeCommits", ...
+    wall_ms FLOAT,
+    subprocesses INTEGER,
+    bytes_read BIGINT,
+    peak_rss_mb FLOAT, -- highest RSS sampled during the stage (process and children)
+    row_count INTEGER,
+    error TEXT, -- set when the stage raised
+    recorded_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_job_stage_timings_job ON job_stage_timings(job_id);
+
 CREATE OR REPLACE FUNCTION notify_job_update() RETURNS trigger AS $$
 BEGIN
   PERFORM pg_notify('job_updates', row_to_json(NEW)::text);
@@ -1,9 +1,23 @@
 import argparse
+import base64
+import fcntl
+import re
 import subprocess
 import os
 import shutil
-from urllib.parse import urlparse, urlunparse
+from contextlib import contextmanager
+from urllib.parse import urlparse, urlunparse, unquote
 import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from instrument import add_arguments, instrumented
+
+# Every URL is fetched once into a bare mirror under the cache directory;
+# checkouts (repos/<identity>/<name> in the worker) are `git clone --shared`
+# copies that borrow the mirror's objects through .git/objects/info/alternates,
+# so a repeat analysis only fetches what changed upstream and writes a working tree.
 
 def arguments():
     parser = argparse.ArgumentParser(description="Clone a Git repository.")
@@ -12,6 +26,11 @@ def arguments():
     parser.add_argument("-b", type=str, help="Branch to clone")
     parser.add_argument("-t", type=str, help="GitHub token for private repo access (optional)")
     parser.add_argument("-x", type=str, default="x-access-token", help="GitHub username for token auth")
+    parser.add_argument("-c", type=str, help="Mirror cache directory (default: $CLONE_CACHE or <output>/.mirrors)")
+    parser.add_argument("--metadata", action="store_true",
+                        help="Only fetch commits and trees (--filter=blob:none) and return the bare mirror")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    add_arguments(parser)
     return parser.parse_args()
 
 def inject_token(url, token, username="x-access-token"):
@@ -23,12 +42,132 @@ def inject_token(url, token, username="x-access-token"):
     new_netloc = f"{username}:{token}@{parsed.netloc}"
     return urlunparse((parsed.scheme, new_netloc, parsed.path, '', '', ''))
 
-def validate_url(url):
+def split_credentials(url):
+    """Return the URL without user info and git options that send it as an auth header.
+
+    Mirrors are shared between users, so credentials never go into their config:
+    each fetch authenticates with the caller's own token, and a caller without
+    access to a private repository fails the fetch instead of reading the cache.
+    """
+    parsed = urlparse(url)
+    if not parsed.username:
+        return url, []
+    netloc = parsed.hostname + (f":{parsed.port}" if parsed.port else "")
+    userinfo = f"{unquote(parsed.username)}:{unquote(parsed.password or '')}"
+    auth = base64.b64encode(userinfo.encode()).decode()
+    return urlunparse(parsed._replace(netloc=netloc)), ["-c", f"http.extraHeader=Authorization: Basic {auth}"]
+
+def cache_key(url):
+    """Relative mirror path for a URL: host/owner/repo, whatever the URL spelling."""
+    parsed = urlparse(url)
+    if parsed.scheme and parsed.netloc:
+        host, path = parsed.hostname or "", parsed.path
+    elif re.match(r"^[\w.-]+@[\w.-]+:", url):
+        host, path = url.split("@", 1)[1].split(":", 1)
+    else:
+        host, path = "local", os.path.abspath(parsed.path or url)
+    path = path.strip("/")
+    if path.endswith(".git"):
+        path = path[:-4]
+    parts = [p for p in path.split("/") if p not in ("", ".", "..")]
+    return os.path.join(host.lower(), *parts) + ".git"
+
+def redact(cmd):
+    return " ".join("http.extraHeader=<redacted>" if a.startswith("http.extraHeader") else a for a in cmd)
+
+def git(*args, cwd=None, input=None):
+    return subprocess.run(["git", *args], cwd=cwd, input=input, check=True, capture_output=True,
+                          text=True).stdout.strip()
+
+def git_config(repo_path, key):
     try:
-        subprocess.run(["git", "ls-remote", url], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return True
+        return git("config", "--get", key, cwd=repo_path)
     except subprocess.CalledProcessError:
-        return False
+        return None
+
+@contextmanager
+def locked(path):
+    """Serialise jobs that create or refresh the same mirror."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+# Refs a mirror keeps: branches and tags only. `clone --mirror` would take
+# refs/* and with it every pull-request head a host like GitHub publishes.
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+def set_refspecs(mirror):
+    """Fetch only MIRROR_REFSPECS into mirror, dropping refs a `clone --mirror` made outside them."""
+    try:
+        current = git("config", "--get-all", "remote.origin.fetch", cwd=mirror).splitlines()
+    except subprocess.CalledProcessError:
+        current = []
+    if current == MIRROR_REFSPECS:
+        return
+    if current:
+        git("config", "--unset-all", "remote.origin.fetch", cwd=mirror)
+    for refspec in MIRROR_REFSPECS:
+        git("config", "--add", "remote.origin.fetch", refspec, cwd=mirror)
+    if git_config(mirror, "remote.origin.mirror"):
+        git("config", "--unset", "remote.origin.mirror", cwd=mirror)
+    stale = [ref for ref in git("for-each-ref", "--format=%(refname)", cwd=mirror).splitlines()
+             if not ref.startswith(("refs/heads/", "refs/tags/"))]
+    if stale:
+        git("update-ref", "--stdin", cwd=mirror, input="".join(f"delete {ref}\n" for ref in stale))
+
+def update_mirror(url, mirror, metadata=False):
+    """Create the bare mirror for url or fetch into it; returns True if it already existed."""
+    bare_url, auth = split_credentials(url)
+    with locked(mirror):
+        if not os.path.isdir(mirror):
+            cmd = [*auth, "clone", "--bare"]
+            if metadata:
+                cmd.append("--filter=blob:none")
+            try:
+                git(*cmd, bare_url, mirror)
+            except subprocess.CalledProcessError:
+                shutil.rmtree(mirror, ignore_errors=True)
+                raise
+            set_refspecs(mirror)
+            # Checkouts borrow these objects, so never prune ones they may still use
+            git("config", "gc.pruneExpire", "never", cwd=mirror)
+            return False
+
+        git("remote", "set-url", "origin", bare_url, cwd=mirror)
+        set_refspecs(mirror)
+        partial = git_config(mirror, "remote.origin.partialclonefilter")
+        if partial and not metadata:
+            # A checkout needs every blob: drop the filter and fetch the full pack
+            git("config", "--unset", "remote.origin.partialclonefilter", cwd=mirror)
+            git(*auth, "fetch", "--refetch", "--prune", "origin", cwd=mirror)
+        else:
+            git(*auth, "fetch", "--prune", "origin", cwd=mirror)
+        return True
+
+def update_checkout(mirror, dest_path, branch=None):
+    """Make dest_path a shared clone of the mirror on branch, refreshing it in place if it exists."""
+    if not os.path.exists(dest_path):
+        cmd = ["clone", "--shared"]
+        if branch:
+            cmd += ["-b", branch]
+        git(*cmd, mirror, dest_path)
+        return branch or get_default_branch(dest_path)
+
+    git("fetch", "--prune", "origin", cwd=dest_path)
+    git("remote", "set-head", "origin", "--auto", cwd=dest_path)
+    branch = branch or get_default_branch(dest_path)
+    git("checkout", "--force", "-B", branch, f"origin/{branch}", cwd=dest_path)
+    return branch
+
+def repo_size(mirror, rev="HEAD"):
+    """Commits on rev and bytes on disk in the mirror, which schedulers use to estimate job cost."""
+    commits = int(git("rev-list", "--count", rev, cwd=mirror))
+    counts = dict(line.split(": ", 1) for line in git("count-objects", "-v", cwd=mirror).splitlines())
+    return {"commits": commits, "size_bytes": (int(counts["size"]) + int(counts["size-pack"])) * 1024}
 
 def get_default_branch(repo_path):
     try:
@@ -44,11 +183,13 @@ def get_default_branch(repo_path):
     except subprocess.CalledProcessError:
         return None
 
-def clone_repo(url, directory, branch=None):
+def clone_repo(url, directory, branch=None, cache_dir=None, metadata=False):
     repo_name = url.rstrip("/").split("/")[-1].replace(".git", "")
     dest_path = os.path.join(directory, repo_name)
+    cache_dir = cache_dir or os.environ.get("CLONE_CACHE") or os.path.join(directory, ".mirrors")
+    mirror = os.path.abspath(os.path.join(cache_dir, cache_key(split_credentials(url)[0])))
 
-    if os.path.exists(dest_path):
+    if not metadata and os.path.exists(dest_path) and git_config(dest_path, "remote.origin.url") != mirror:
         print(f"Directory '{dest_path}' already exists. Skipping clone.")
         return {
             "status": "skipped",
@@ -56,45 +197,53 @@ def clone_repo(url, directory, branch=None):
             "path": dest_path
         }
 
-    if not validate_url(url):
-        print(f"Error: URL '{url}' is invalid or inaccessible.")
-        return {
-            "status": "error",
-            "message": f"URL '{url}' is invalid or inaccessible.",
-            "path": None
-        }
-
-    cmd = ["git", "clone"]
-    if branch:
-        cmd += ["-b", branch]
-    cmd += [url, dest_path]
-
+    step = "fetch"
     try:
-        subprocess.run(cmd, check=True)
-        cloned_branch = branch or get_default_branch(dest_path)
+        cached = update_mirror(url, mirror, metadata)
+        if metadata:
+            # Bare and shared: callers may read it with git log but must not write into it
+            print(f"Successfully fetched '{repo_name}' metadata")
+            return {
+                "status": "success",
+                "message": f"Successfully fetched '{repo_name}' metadata",
+                "path": mirror,
+                "branch": branch or git("symbolic-ref", "--short", "HEAD", cwd=mirror),
+                "mirror": mirror,
+                "cached": cached,
+                **repo_size(mirror, branch or "HEAD")
+            }
+        step = "checkout"
+        cloned_branch = update_checkout(mirror, dest_path, branch)
         print(f"Successfully cloned '{repo_name}'")
         return {
             "status": "success",
             "message": f"Successfully cloned '{repo_name}'",
             "path": dest_path,
-            "branch": cloned_branch
+            "branch": cloned_branch,
+            "mirror": mirror,
+            "cached": cached,
+            **repo_size(mirror, f"refs/heads/{cloned_branch}")
         }
     except subprocess.CalledProcessError as e:
-        if os.path.exists(dest_path):
-            shutil.rmtree(dest_path)
-        print(f"Error: Failed to clone repository '{repo_name}' : {e}")
+        if step == "checkout" and not os.path.exists(os.path.join(dest_path, ".git")):
+            shutil.rmtree(dest_path, ignore_errors=True)
+        error = (e.stderr or f"{redact(e.cmd)} exited with status {e.returncode}").strip()
+        print(f"Error: Failed to clone repository '{repo_name}' : {error}")
         return {
             "status": "error",
             "message": f"Failed to clone repository '{repo_name}'",
-            "error": str(e),
-            "command": " ".join(cmd)
+            "error": error,
+            "command": redact(e.cmd)
         }
 
 def main():
     args = arguments()
     secure_url = inject_token(args.u, args.t, args.x)
-    clone_repo(secure_url, args.d, args.b)
-    result = clone_repo(secure_url, args.d, args.b)
+    with instrumented(args.timings, args.profile) as recorder, recorder.stage("clone_repo"):
+        result = clone_repo(secure_url, args.d, args.b, args.c, args.metadata)
+    if args.json:
+        print(json.dumps(result))
+        return
     print(result["message"])
     if result["status"] == "success":
         print(f"Repository cloned to {result['path']} on branch {result['branch']}")
@@ -102,4 +251,4 @@ def main():
         print(f"Clone failed: {result['message']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,27 @@
 import argparse
 import os
+import sys
 import git
 import json
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analysis"))
+
+from history import MERGE_MODES, HistoryError, add_merge_argument, commit_record, walk_history
+from instrument import add_arguments, instrumented
+from ndjson import write_record, write_records
+
 def arguments():
     parser = argparse.ArgumentParser(description="Extract commit metadata from a Git repository.")
     parser.add_argument("-p", required=True, type=str, help="Path to local Git repository")
+    parser.add_argument("--per-commit-stats", action="store_true",
+                        help="Read commit.stats through GitPython (one git process per commit)")
+    parser.add_argument("--ndjson", action="store_true", help="Stream one JSON record per commit")
+    add_merge_argument(parser)
+    add_arguments(parser)
     return parser.parse_args()
 
-def extract_commits(repo_path):
+def extract_commits(repo_path, per_commit_stats=False, merges="all"):
     if not os.path.isdir(repo_path):
         return {
             "status": "error",
@@ -26,7 +38,11 @@ def extract_commits(repo_path):
             "commits": []
         }
 
-    commits = list(repo.iter_commits('HEAD', reverse=True))
+    if not per_commit_stats:
+        return _extract_commits_bulk(repo_path, merges)
+
+    selection = {option[2:].replace("-", "_"): True for option in MERGE_MODES[merges]}
+    commits = list(repo.iter_commits('HEAD', reverse=True, **selection))
     result = []
 
     for commit in commits:
@@ -62,10 +78,54 @@ def extract_commits(repo_path):
         "commits": result
     }
 
+def _iter_commits_bulk(repo_path, merges="all"):
+    # One `git log --numstat` for the whole history. Renames off and merges
+    # diffed against their first parent, exactly as commit.stats does; with
+    # merges="no-merges" git skips those diffs altogether.
+    for commit in walk_history(repo_path, renames=False, merge_diffs=True, merges=merges):
+        yield commit_record(commit)
+
+def _extract_commits_bulk(repo_path, merges="all"):
+    try:
+        result = list(_iter_commits_bulk(repo_path, merges))
+    except HistoryError as e:
+        return {
+            "status": "error",
+            "message": str(e),
+            "commits": []
+        }
+
+    return {
+        "status": "success",
+        "path": repo_path,
+        "total_commits": len(result),
+        "commits": result
+    }
+
+def extract_commits_ndjson(repo_path, merges="all"):
+    """Stream the bulk extract_commits output: one "commit" record per commit, then a "summary" record."""
+    if not os.path.isdir(repo_path):
+        write_record({"type": "summary", "status": "error", "message": f"Provided path does not exist: {repo_path}"})
+        return
+
+    try:
+        total = write_records(_iter_commits_bulk(repo_path, merges), "commit")
+    except HistoryError as e:
+        write_record({"type": "summary", "status": "error", "message": str(e)})
+        return
+
+    write_record({"type": "summary", "status": "success", "path": repo_path, "total_commits": total})
+    return total
+
 def main():
     args = arguments()
-    output = extract_commits(args.p)
-    print(json.dumps(output, indent=2))
+    with instrumented(args.timings, args.profile) as recorder, recorder.stage("extract_commits") as stage:
+        if args.ndjson:
+            stage.rows = extract_commits_ndjson(args.p, args.merges) or 0
+        else:
+            output = extract_commits(args.p, args.per_commit_stats, args.merges)
+            stage.rows = len(output["commits"])
+            print(json.dumps(output, indent=2))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
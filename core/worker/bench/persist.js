@@ -0,0 +1,148 @@
+// Rows/second of the bulk writers in lib/persist.js against the old
+// one-query-per-row statements, on a local Postgres with core/db/schema.sql.
+//
+//   DATABASE_URL=postgres://... node bench/persist.js [commits]
+const { Pool } = require("pg");
+const path = require("path");
+const crypto = require("crypto");
+const persist = require("../lib/persist");
+require("dotenv").config({ path: path.resolve(__dirname, "../../../.env") });
+
+const pool = new Pool({ connectionString: process.env.DATABASE_URL });
+
+function syntheticCommits(n, seed) {
+  const commits = [];
+  for (let i = 0; i < n; i++) {
+    const hash = crypto.createHash("sha1").update(`${seed}-${i}`).digest("hex");
+    const date = new Date(Date.UTC(2020, 0, 1) + i * 3600 * 1000).toISOString().slice(0, 19);
+    commits.push({
+      hash,
+      author_name: `Dev ${i % 17}`,
+      author_email: `dev${i % 17}@example.com`,
+      authored_date: date,
+      committer_name: `Dev ${i % 17}`,
+      committer_email: `dev${i % 17}@example.com`,
+      committed_date: date,
+      message: i % 3 === 0 ? `fix crash ${i}` : `add feature ${i}`,
+      classification: i % 3 === 0 ? "Corrective" : "Feature Addition",
+      is_merge: false,
+      metrics: { ns: 1, nd: 2, nf: 3, entropy: 0.5, la: 10, ld: 4, lt: 120, ndev: 2, age: 3.5, nuc: 4, exp: i, rexp: 1, sexp: 2 },
+    });
+  }
+  return commits;
+}
+
+function linksFor(commits) {
+  const links = [];
+  for (let i = 3; i < commits.length; i += 3) {
+    links.push({ buggy_commit: commits[i - 2].hash, linked_to: [commits[i].hash] });
+  }
+  return links;
+}
+
+// The writers as they were: one awaited query per row
+const rowwise = {
+  async storeCommits(pool, commits, repoId) {
+    const client = await pool.connect();
+    try {
+      await client.query("BEGIN");
+      for (const c of commits) {
+        await client.query(`
+          INSERT INTO commits (
+            repository_id, hash, author_name, author_email, authored_date,
+            committer_name, committer_email, committed_date, message,
+            classification, is_merged, created_at, contains_bug
+          ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, NOW(), FALSE)
+          ON CONFLICT (hash) DO NOTHING
+        `, [repoId, c.hash, c.author_name, c.author_email, c.authored_date, c.committer_name,
+          c.committer_email, c.committed_date, c.message, c.classification, c.is_merge]);
+      }
+      await client.query("COMMIT");
+    } finally {
+      client.release();
+    }
+  },
+  async updateBugLinks(pool, linked) {
+    const client = await pool.connect();
+    try {
+      await client.query("BEGIN");
+      for (const l of linked) {
+        await client.query(`UPDATE commits SET fixes = $1, is_linked = true WHERE hash = $2`,
+          [JSON.stringify(l.linked_to), l.buggy_commit]);
+        for (const bug of l.linked_to) {
+          await client.query(`UPDATE commits SET contains_bug = true WHERE hash = $1`, [bug]);
+        }
+      }
+      await client.query("COMMIT");
+    } finally {
+      client.release();
+    }
+  },
+  async updateMetrics(pool, metrics) {
+    const client = await pool.connect();
+    try {
+      await client.query("BEGIN");
+      for (const m of metrics) {
+        await client.query(`
+          INSERT INTO metrics (commit_id, ns, nd, nf, entropy, la, ld, lt, ndev, age, nuc, exp, rexp, sexp, computed_at)
+          VALUES ((SELECT id FROM commits WHERE hash = $1), $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, NOW())
+          ON CONFLICT (commit_id) DO UPDATE SET ns = EXCLUDED.ns, computed_at = NOW()
+        `, [m.hash, m.ns, m.nd, m.nf, m.entropy, m.la, m.ld, m.lt, m.ndev, m.age, m.nuc, m.exp, m.rexp, m.sexp]);
+      }
+      await client.query("COMMIT");
+    } finally {
+      client.release();
+    }
+  },
+};
+
+async function timed(fn) {
+  const start = process.hrtime.bigint();
+  await fn();
+  return Number(process.hrtime.bigint() - start) / 1e9;
+}
+
+async function run(name, writers, n) {
+  const url = `bench://${name}/${Date.now()}`;
+  const { rows } = await pool.query(
+    "INSERT INTO repositories (name, url) VALUES ($1, $2) RETURNING id", [`bench-${name}`, url]
+  );
+  const repoId = rows[0].id;
+  const commits = syntheticCommits(n, url);
+  const links = linksFor(commits);
+  const metrics = commits.map((c) => ({ hash: c.hash, ...c.metrics }));
+
+  try {
+    const commitsSec = await timed(() => writers.storeCommits(pool, commits, repoId));
+    const metricsSec = await timed(() => writers.updateMetrics(pool, metrics));
+    const linksSec = await timed(() => writers.updateBugLinks(pool, links));
+    const rate = (rowsWritten, sec) => Math.round(rowsWritten / Math.max(sec, 1e-9));
+    return {
+      commits_per_second: rate(commits.length, commitsSec),
+      metrics_per_second: rate(metrics.length, metricsSec),
+      links_per_second: rate(links.length, linksSec),
+      total_seconds: +(commitsSec + metricsSec + linksSec).toFixed(3),
+    };
+  } finally {
+    await pool.query("DELETE FROM repositories WHERE id = $1", [repoId]);
+  }
+}
+
+async function main() {
+  const n = parseInt(process.argv[2] || "20000", 10);
+  const rowwiseStats = await run("rowwise", rowwise, n);
+  const bulkStats = await run("bulk", persist, n);
+  console.log(JSON.stringify({
+    commits: n,
+    rowwise: rowwiseStats,
+    bulk: bulkStats,
+    speedup: +(rowwiseStats.total_seconds / bulkStats.total_seconds).toFixed(2),
+  }, null, 2));
+}
+
+main()
+  .catch((err) => {
+    console.error(err);
+    process.exitCode = 1;
+  })
+  .finally(() => pool.end());
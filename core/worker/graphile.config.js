@@ -5,6 +5,8 @@ const preset = {
   worker: {
     taskDirectory: `./tasks`,
     connectionString: process.env.DATABASE_URL,
+    // Jobs run side by side; lib/scheduler.js limits their clones and heavy stages
+    concurrency: Number(process.env.WORKER_CONCURRENCY) || 4,
   },
 };
 
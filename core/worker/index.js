@@ -2,6 +2,8 @@ const { run } = require("graphile-worker");
 const { Pool } = require("pg");
 const preset = require("./graphile.config");
 const path = require("path");
+const os = require("os");
+const analysis = require("./lib/analysisClient");
 
 require("dotenv").config({ path: path.resolve(__dirname, "../../.env") });
 
@@ -30,8 +32,31 @@ async function waitForDatabase(retries = MAX_RETRIES) {
   }
 }
 
+// Starts the long-lived analysis server unless ANALYSIS_SERVER=off; tasks fall
+// back to one Python process per step when ANALYSIS_SOCKET is not set.
+async function startAnalysisServer() {
+  if (process.env.ANALYSIS_SERVER === "off") return null;
+  const socketPath = process.env.ANALYSIS_SOCKET || path.join(os.tmpdir(), "commitguru-analysis.sock");
+  try {
+    const child = await analysis.startServer(socketPath);
+    process.env.ANALYSIS_SOCKET = socketPath;
+    process.on("exit", () => child.kill());
+    child.on("exit", (code) => {
+      console.warn(`[core] Analysis server exited with code ${code}, using per-step scripts`);
+      delete process.env.ANALYSIS_SOCKET;
+    });
+    console.log(`[core] Analysis server listening on ${socketPath}`);
+    return child;
+  } catch (err) {
+    console.warn("[core] Analysis server unavailable, using per-step scripts:", err.message);
+    delete process.env.ANALYSIS_SOCKET;
+    return null;
+  }
+}
+
 async function main() {
   await waitForDatabase();
+  await startAnalysisServer();
   const runner = await run({ pgPool: pool, preset });
   await runner.promise;
 }
@@ -0,0 +1,63 @@
+// Client for core/analysis/server.py: one long-lived Python process that keeps
+// imports warm and an open repository per job across clone/analyze/link.
+const net = require("net");
+const path = require("path");
+const readline = require("readline");
+const { spawn } = require("child_process");
+
+const SERVER_SCRIPT = path.resolve(__dirname, "../../analysis/server.py");
+
+let nextId = 1;
+
+// Sends one request and streams its records to onRecord; resolves with the result
+async function call(socketPath, method, params = {}, onRecord = async () => {}) {
+  const socket = net.createConnection(socketPath);
+  await new Promise((resolve, reject) => {
+    socket.once("connect", resolve);
+    socket.once("error", reject);
+  });
+
+  const id = nextId++;
+  socket.write(JSON.stringify({ id, method, params }) + "\n");
+  try {
+    const lines = readline.createInterface({ input: socket, crlfDelay: Infinity });
+    for await (const line of lines) {
+      if (!line) continue;
+      const message = JSON.parse(line);
+      if (message.record) {
+        await onRecord(message.record);
+      } else if (message.error) {
+        const error = new Error(`${message.error.type}: ${message.error.message}`);
+        // Stages the failed call recorded, for the job's timings
+        error.timings = message.error.timings || [];
+        throw error;
+      } else {
+        return message.result;
+      }
+    }
+    throw new Error("Analysis server closed the connection");
+  } finally {
+    socket.destroy();
+  }
+}
+
+// Starts the server and resolves with the child process once it listens
+function startServer(socketPath) {
+  return new Promise((resolve, reject) => {
+    const child = spawn("python3", [SERVER_SCRIPT, "--socket", socketPath], {
+      stdio: ["ignore", "pipe", "inherit"],
+    });
+    const lines = readline.createInterface({ input: child.stdout });
+    const onExit = (code) => reject(new Error(`Analysis server exited with code ${code}`));
+    child.once("exit", onExit);
+    child.once("error", reject);
+    lines.on("line", (line) => {
+      if (line.includes('"status": "ready"')) {
+        child.off("exit", onExit);
+        resolve(child);
+      }
+    });
+  });
+}
+
+module.exports = { call, startServer };
@@ -0,0 +1,178 @@
+// Set-based writers for analysis output. Each call sends whole columns as
+// Postgres arrays and lets unnest() expand them, so a chunk of rows costs one
+// round trip instead of one (or more) per row.
+
+// Rows per statement; keeps individual statements and their arrays bounded
+const CHUNK_SIZE = 5000;
+
+function chunks(rows, size = CHUNK_SIZE) {
+  const out = [];
+  for (let i = 0; i < rows.length; i += size) out.push(rows.slice(i, i + size));
+  return out;
+}
+
+function column(rows, key, fallback = null) {
+  return rows.map((r) => (r[key] === undefined || r[key] === null ? fallback : r[key]));
+}
+
+async function inTransaction(pool, fn) {
+  const client = await pool.connect();
+  try {
+    await client.query("BEGIN");
+    const result = await fn(client);
+    await client.query("COMMIT");
+    return result;
+  } catch (e) {
+    await client.query("ROLLBACK");
+    throw e;
+  } finally {
+    client.release();
+  }
+}
+
+async function storeCommits(pool, commits, repoId) {
+  if (commits.length === 0) return "0 commits inserted";
+
+  return inTransaction(pool, async (client) => {
+    let inserted = 0;
+    for (const rows of chunks(commits)) {
+      const res = await client.query(`
+        INSERT INTO commits (
+          repository_id, hash, author_name, author_email, authored_date,
+          committer_name, committer_email, committed_date, message,
+          classification, is_merged, created_at, contains_bug
+        )
+        SELECT $1, u.hash, u.author_name, u.author_email, u.authored_date,
+               u.committer_name, u.committer_email, u.committed_date, u.message,
+               u.classification, u.is_merged, NOW(), FALSE
+        FROM unnest(
+          $2::text[], $3::text[], $4::text[], $5::timestamp[],
+          $6::text[], $7::text[], $8::timestamp[], $9::text[],
+          $10::text[], $11::boolean[]
+        ) AS u(hash, author_name, author_email, authored_date,
+               committer_name, committer_email, committed_date, message,
+               classification, is_merged)
+        ON CONFLICT (hash) DO NOTHING
+      `, [
+        repoId,
+        column(rows, "hash"),
+        column(rows, "author_name"),
+        column(rows, "author_email"),
+        column(rows, "authored_date"),
+        column(rows, "committer_name"),
+        column(rows, "committer_email"),
+        column(rows, "committed_date"),
+        column(rows, "message"),
+        column(rows, "classification", "None"),
+        column(rows, "is_merge", false)
+      ]);
+      inserted += res.rowCount;
+    }
+    return `${inserted} commits inserted`;
+  });
+}
+
+async function updateBugLinks(pool, linked) {
+  if (linked.length === 0) return;
+
+  await inTransaction(pool, async (client) => {
+    for (const rows of chunks(linked)) {
+      await client.query(`
+        UPDATE commits c SET fixes = (
+          -- Re-scans only link new fixes: add them to the ones stored before
+          SELECT jsonb_agg(DISTINCT f) FROM jsonb_array_elements(COALESCE(c.fixes, '[]') || u.fixes::jsonb) AS f
+        ), is_linked = true
+        FROM unnest($1::text[], $2::text[]) AS u(hash, fixes)
+        WHERE c.hash = u.hash
+      `, [
+        rows.map((l) => l.buggy_commit),
+        rows.map((l) => JSON.stringify(l.linked_to))  // ✅ matches Python output
+      ]);
+
+      const bugs = [...new Set(rows.flatMap((l) => l.linked_to))];
+      await client.query(
+        `UPDATE commits SET contains_bug = true WHERE hash = ANY($1::text[])`,
+        [bugs]
+      );
+    }
+  });
+}
+
+const METRIC_COLUMNS = ["ns", "nd", "nf", "entropy", "la", "ld", "lt", "ndev", "age", "nuc", "exp", "rexp", "sexp"];
+
+async function updateMetrics(pool, metrics) {
+  if (metrics.length === 0) return;
+
+  // One row per commit: ON CONFLICT cannot touch the same row twice in a statement
+  const latest = [...new Map(metrics.map((m) => [m.hash, m])).values()];
+
+  await inTransaction(pool, async (client) => {
+    for (const rows of chunks(latest)) {
+      await client.query(`
+        INSERT INTO metrics (
+          commit_id, ${METRIC_COLUMNS.join(", ")}, computed_at
+        )
+        SELECT c.id, ${METRIC_COLUMNS.map((k) => `u.${k}`).join(", ")}, NOW()
+        FROM unnest(
+          $1::text[], ${METRIC_COLUMNS.map((_, i) => `$${i + 2}::float8[]`).join(", ")}
+        ) AS u(hash, ${METRIC_COLUMNS.join(", ")})
+        JOIN commits c ON c.hash = u.hash
+        ON CONFLICT (commit_id) DO UPDATE SET
+          ${METRIC_COLUMNS.map((k) => `${k} = EXCLUDED.${k}`).join(",\n          ")},
+          computed_at = NOW()
+      `, [column(rows, "hash"), ...METRIC_COLUMNS.map((k) => column(rows, k, 0))]);
+    }
+  });
+}
+
+// Rebuilds a repository's commit_rollups and metric_rollups from its commits in
+// one transaction, so dashboards read a few hundred rows instead of scanning
+// every commit. Rows are per month plus one '-infinity' row for all history.
+// Runs after linking, since bug-inducing counts need contains_bug.
+async function refreshRollups(pool, repoId) {
+  const periodOf = "CASE WHEN GROUPING(period) = 1 THEN '-infinity'::date ELSE period END";
+  // Commits with neither date have no month; they still count towards all history
+  const datedOrTotal = "HAVING GROUPING(period) = 1 OR period IS NOT NULL";
+
+  return inTransaction(pool, async (client) => {
+    await client.query("DELETE FROM commit_rollups WHERE repository_id = $1", [repoId]);
+    await client.query("DELETE FROM metric_rollups WHERE repository_id = $1", [repoId]);
+
+    const commits = await client.query(`
+      INSERT INTO commit_rollups (repository_id, period, classification, commits, bug_inducing)
+      SELECT $1::uuid, ${periodOf}, classification, COUNT(*), COUNT(*) FILTER (WHERE contains_bug)
+      FROM (
+        SELECT date_trunc('month', COALESCE(authored_date, committed_date))::date AS period,
+               COALESCE(classification, '') AS classification, contains_bug
+        FROM commits
+        WHERE repository_id = $1::uuid
+      ) c
+      GROUP BY GROUPING SETS ((period, classification), (classification))
+      ${datedOrTotal}
+    `, [repoId]);
+
+    const metrics = await client.query(`
+      INSERT INTO metric_rollups (repository_id, period, metric, commits, mean, p50, p90, p99)
+      SELECT $1::uuid, ${periodOf}, metric, COUNT(*), AVG(value),
+             percentile_cont(0.5) WITHIN GROUP (ORDER BY value),
+             percentile_cont(0.9) WITHIN GROUP (ORDER BY value),
+             percentile_cont(0.99) WITHIN GROUP (ORDER BY value)
+      FROM (
+        SELECT date_trunc('month', COALESCE(c.authored_date, c.committed_date))::date AS period,
+               u.metric, u.value
+        FROM commits c
+        JOIN metrics m ON m.commit_id = c.id
+        CROSS JOIN LATERAL unnest(
+          $2::text[], ARRAY[${METRIC_COLUMNS.map((k) => `m.${k}`).join(", ")}]
+        ) AS u(metric, value)
+        WHERE c.repository_id = $1::uuid
+      ) s
+      GROUP BY GROUPING SETS ((period, metric), (metric))
+      ${datedOrTotal}
+    `, [repoId, METRIC_COLUMNS]);
+
+    return commits.rowCount + metrics.rowCount;
+  });
+}
+
+module.exports = { storeCommits, updateBugLinks, updateMetrics, refreshRollups, CHUNK_SIZE };
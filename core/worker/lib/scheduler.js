@@ -0,0 +1,133 @@
+// Admission control shared by every analyzeRepo job in this worker process.
+// graphile-worker runs up to WORKER_CONCURRENCY jobs at once; the scheduler
+// keeps them from all running their heavy Python stages together:
+//   - clones: at most CLONE_CONCURRENCY fetches at a time
+//   - heavy:  at most HEAVY_STAGES history walks (analyze/metrics) and
+//             link runs at a time, across all jobs
+// Waiters are admitted cheapest first by estimated cost (commit count), so a
+// burst of small repositories is not stuck behind one huge one. Cost shrinks
+// with time waited, so large jobs still run under a steady stream of small ones.
+// Concurrent jobs for the same URL share one clone, which is deleted when the
+// last of them is done.
+
+const crypto = require("crypto");
+const fs = require("fs");
+const os = require("os");
+const path = require("path");
+
+// A waiter's cost is divided by (1 + waited / AGING_MS)
+const AGING_MS = 60 * 1000;
+
+// Cost of a repository seen for the first time, before clone reports its size
+const DEFAULT_COST = 10000;
+
+class PriorityGate {
+  constructor(slots) {
+    this.slots = Math.max(1, slots);
+    this.active = 0;
+    this.waiting = [];
+  }
+
+  acquire(cost) {
+    if (this.active < this.slots) {
+      this.active++;
+      return Promise.resolve();
+    }
+    return new Promise((resolve) => this.waiting.push({ cost, since: Date.now(), resolve }));
+  }
+
+  release() {
+    if (this.waiting.length === 0) {
+      this.active--;
+      return;
+    }
+    // Hand the slot straight to the cheapest waiter
+    const now = Date.now();
+    const priority = (w) => w.cost / (1 + (now - w.since) / AGING_MS);
+    let next = 0;
+    for (let i = 1; i < this.waiting.length; i++) {
+      if (priority(this.waiting[i]) < priority(this.waiting[next])) next = i;
+    }
+    this.waiting.splice(next, 1)[0].resolve();
+  }
+
+  async run(cost, fn) {
+    await this.acquire(cost);
+    try {
+      return await fn();
+    } finally {
+      this.release();
+    }
+  }
+}
+
+// Checkout directory for a URL and credentials: <root>/<hash>/<name>. Jobs share
+// a checkout exactly when they share this identity, so two jobs never reset
+// the same working tree for different repositories or tokens.
+function checkoutIdentity(root, repoUrl, token) {
+  const key = `${repoUrl}\0${token || ""}`;
+  const directory = path.join(root, crypto.createHash("sha256").update(key).digest("hex").slice(0, 16));
+  return { key, directory, targetDir: path.join(directory, path.basename(repoUrl, ".git")) };
+}
+
+// One checkout per key (URL and credentials) while any job uses it: the first
+// job clones into `directory`, jobs that arrive before the last one releases
+// it reuse that clone instead of fetching again (and instead of resetting the
+// working tree under a running analysis). The last release deletes the
+// directory, so rotated tokens do not leave working trees behind; the objects
+// stay in the shared mirror, so the next job's clone is only a checkout.
+class SharedCheckouts {
+  constructor() {
+    this.byKey = new Map();
+    this.removing = new Map(); // key -> deletion of its last checkout, awaited by the next clone
+  }
+
+  // Returns { ready, release }: ready resolves with clone()'s result, and the
+  // caller must call release() once it no longer reads the checkout
+  acquire(key, directory, clone) {
+    let entry = this.byKey.get(key);
+    if (!entry) {
+      entry = { users: 0, directory, ready: (this.removing.get(key) || Promise.resolve()).then(clone) };
+      this.byKey.set(key, entry);
+      // A failed clone is not shared with jobs that arrive later
+      entry.ready.catch(() => this.forget(key, entry));
+    }
+    entry.users++;
+    let released = false;
+    const release = () => {
+      if (released) return;
+      released = true;
+      if (--entry.users === 0) this.remove(key, entry);
+    };
+    return { ready: entry.ready, release };
+  }
+
+  remove(key, entry) {
+    this.forget(key, entry);
+    const removed = entry.ready
+      .catch(() => {})
+      .then(() => fs.promises.rm(entry.directory, { recursive: true, force: true }))
+      .catch((e) => console.error(`Could not remove checkout ${entry.directory}:`, e))
+      .finally(() => {
+        if (this.removing.get(key) === removed) this.removing.delete(key);
+      });
+    this.removing.set(key, removed);
+    return removed;
+  }
+
+  forget(key, entry) {
+    if (this.byKey.get(key) === entry) this.byKey.delete(key);
+  }
+}
+
+const cpus = os.cpus().length;
+
+module.exports = {
+  DEFAULT_COST,
+  PriorityGate,
+  SharedCheckouts,
+  checkoutIdentity,
+  clones: new PriorityGate(Number(process.env.CLONE_CONCURRENCY) || 2),
+  heavy: new PriorityGate(Number(process.env.HEAVY_STAGES) || Math.max(1, Math.floor(cpus / 2))),
+  checkouts: new SharedCheckouts(),
+};
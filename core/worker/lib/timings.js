@@ -0,0 +1,77 @@
+// Per-stage cost of one job. Python stages measure themselves (instrument.py)
+// and hand back their stages; DB writers are timed here. Stages with the same
+// name are folded together, so a writer called once per batch is one row.
+// peak_rss_mb is the highest RSS sampled while a stage ran, not a lifetime
+// maximum; concurrent jobs in this worker share the process it measures.
+
+// Milliseconds between RSS samples while a DB write runs
+const RSS_INTERVAL_MS = 50;
+
+const rssMb = () => process.memoryUsage.rss() / (1 << 20);
+
+class JobTimings {
+  constructor() {
+    this.stages = new Map();
+  }
+
+  add({ stage, wall_ms = 0, subprocesses = 0, bytes_read = null, peak_rss_mb = null, rows = 0, error = null }) {
+    const t = this.stages.get(stage);
+    if (!t) {
+      this.stages.set(stage, { stage, wall_ms, subprocesses, bytes_read, peak_rss_mb, rows, error });
+      return;
+    }
+    if (error !== null) t.error = error;
+    t.wall_ms += wall_ms;
+    t.subprocesses += subprocesses;
+    t.rows += rows;
+    if (bytes_read !== null) t.bytes_read = (t.bytes_read || 0) + bytes_read;
+    if (peak_rss_mb !== null) t.peak_rss_mb = Math.max(t.peak_rss_mb || 0, peak_rss_mb);
+  }
+
+  addAll(stages = []) {
+    for (const s of stages) this.add(s);
+  }
+
+  // Times one DB write under `stage`; `rows` is a count, or a function of fn's result
+  async time(stage, rows, fn) {
+    const start = process.hrtime.bigint();
+    let peak = rssMb();
+    const sampler = setInterval(() => {
+      peak = Math.max(peak, rssMb());
+    }, RSS_INTERVAL_MS);
+    sampler.unref();
+    let result;
+    let error = null;
+    try {
+      result = await fn();
+      return result;
+    } catch (e) {
+      error = String(e);
+      throw e;
+    } finally {
+      clearInterval(sampler);
+      this.add({
+        stage,
+        wall_ms: Number(process.hrtime.bigint() - start) / 1e6,
+        peak_rss_mb: Math.max(peak, rssMb()),
+        rows: typeof rows === "function" ? (result === undefined ? 0 : rows(result)) : rows,
+        error,
+      });
+    }
+  }
+
+  async save(pool, jobId) {
+    const rows = [...this.stages.values()];
+    if (rows.length === 0) return;
+    const col = (k) => rows.map((r) => r[k]);
+    await pool.query(`
+      INSERT INTO job_stage_timings (job_id, stage, wall_ms, subprocesses, bytes_read, peak_rss_mb, row_count, error)
+      SELECT $1, * FROM unnest($2::text[], $3::float8[], $4::int[], $5::bigint[], $6::float8[], $7::int[], $8::text[])
+    `, [
+      jobId, col("stage"), col("wall_ms"), col("subprocesses"), col("bytes_read"), col("peak_rss_mb"), col("rows"),
+      col("error"),
+    ]);
+  }
+}
+
+module.exports = { JobTimings };
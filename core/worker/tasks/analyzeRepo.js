@@ -1,13 +1,22 @@
 const { Pool } = require("pg");
-const { execFile } = require("child_process");
+const { execFile, spawn } = require("child_process");
 const path = require("path");
 const fs = require("fs");
+const os = require("os");
+const readline = require("readline");
+const persist = require("../lib/persist");
+const analysis = require("../lib/analysisClient");
+const { JobTimings } = require("../lib/timings");
+const scheduler = require("../lib/scheduler");
 require("dotenv").config({ path: path.resolve(__dirname, "../../../.env") });
 
 const pool = new Pool({
   connectionString: process.env.DATABASE_URL,
 });
 
+// Records buffered from a streaming script before they are written to the DB
+const BATCH_SIZE = persist.CHUNK_SIZE;
+
 async function update(jobId, step, status = "in_progress", log = "") {
   await pool.query(
     "UPDATE jobs SET step = $1, status = $2, log = $3, updated_at = NOW() WHERE id = $4",
@@ -15,13 +24,25 @@ async function update(jobId, step, status = "in_progress", log = "") {
   );
 }
 
-async function markDone(jobId) {
+async function markDone(jobId, log = "") {
   await pool.query(
-    "UPDATE jobs SET status = 'completed', step = 'done', updated_at = NOW() WHERE id = $1",
-    [jobId]
+    "UPDATE jobs SET status = 'completed', step = 'done', log = $1, updated_at = NOW() WHERE id = $2",
+    [log, jobId]
   );
 }
 
+// Fixes listed in the job log when the linker could not blame them
+const MAX_LOGGED_ERRORS = 50;
+
+// Job log text for the per-fix errors in a link summary, "" when there were none
+function linkErrorLog(summary) {
+  const errors = summary.errors || [];
+  if (errors.length === 0) return "";
+  const lines = errors.slice(0, MAX_LOGGED_ERRORS).map((e) => `${e.fix}: ${e.error}`);
+  if (errors.length > lines.length) lines.push(`... and ${errors.length - lines.length} more`);
+  return `${errors.length} of ${summary.fixes} fixes could not be linked:\n${lines.join("\n")}`;
+}
+
 async function markError(jobId, message) {
   await pool.query(
     "UPDATE jobs SET status = 'error', error = $1, updated_at = NOW() WHERE id = $2",
@@ -41,130 +62,85 @@ function runPython(scriptPath, args = []) {
   });
 }
 
-async function storeCommits(commits, repoId) {
-  const client = await pool.connect();
+// Runs a script in --ndjson mode and hands each record to onRecord as soon as
+// it is printed; resolves with the final summary record.
+async function streamPython(scriptPath, args, onRecord) {
+  const child = spawn("python3", [scriptPath, ...args, "--ndjson"]);
+  const exited = new Promise((resolve) => child.on("close", resolve));
+  let stderr = "";
+  child.stderr.on("data", (chunk) => {
+    stderr += chunk;
+  });
+
+  let summary = null;
   try {
-    await client.query("BEGIN");
-
-    const insertQuery = `
-      INSERT INTO commits (
-        repository_id, hash, author_name, author_email, authored_date,
-        committer_name, committer_email, committed_date, message,
-        classification, is_merged, created_at, contains_bug
-      ) VALUES (
-        $1, $2, $3, $4, $5,
-        $6, $7, $8, $9,
-        $10, $11, NOW(), FALSE
-      ) ON CONFLICT (hash) DO NOTHING
-    `;
-
-    for (const c of commits) {
-      await client.query(insertQuery, [
-        repoId,
-        c.hash,
-        c.author_name,
-        c.author_email,
-        c.authored_date,
-        c.committer_name,
-        c.committer_email,
-        c.committed_date,
-        c.message,
-        c.classification || "None",
-        c.is_merge || false
-      ]);
+    const lines = readline.createInterface({ input: child.stdout, crlfDelay: Infinity });
+    for await (const line of lines) {
+      if (!line) continue;
+      const record = JSON.parse(line);
+      if (record.type === "summary") {
+        summary = record;
+      } else {
+        await onRecord(record);
+      }
     }
-
-    await client.query("COMMIT");
-    return `${commits.length} commits inserted`;
   } catch (e) {
-    await client.query("ROLLBACK");
+    child.kill();
     throw e;
-  } finally {
-    client.release();
   }
+
+  const code = await exited;
+  if (code !== 0) throw new Error(stderr || `${scriptPath} exited with code ${code}`);
+  if (!summary) throw new Error(`${scriptPath} ended without a summary`);
+  if (summary.status !== "success") throw new Error(summary.message || `${scriptPath} failed`);
+  return summary;
 }
 
-async function updateBugLinks(linked) {
-  const client = await pool.connect();
+// Runs a script with --timings pointed at a scratch file and adds the stages it
+// reports to `timings`, even when the script fails.
+async function timedScript(timings, scriptPath, args, run) {
+  const file = path.join(os.tmpdir(), `${process.pid}-${path.basename(scriptPath, ".py")}-${Date.now()}.timings.json`);
   try {
-    await client.query("BEGIN");
-    for (const l of linked) {
-      await client.query(
-        `UPDATE commits SET fixes = $1, is_linked = true WHERE hash = $2`,
-        [JSON.stringify(l.linked_to), l.buggy_commit]  // ✅ matches Python output
-      );
-      for (const bug of l.linked_to) {
-        await client.query(
-          `UPDATE commits SET contains_bug = true WHERE hash = $1`,
-          [bug]
-        );
-      }
-    }
-    await client.query("COMMIT");
-  } catch (e) {
-    await client.query("ROLLBACK");
-    throw e;
+    return await run([...args, "--timings", file]);
   } finally {
-    client.release();
+    if (fs.existsSync(file)) {
+      timings.addAll(JSON.parse(fs.readFileSync(file, "utf8")));
+      fs.unlinkSync(file);
+    }
   }
 }
 
-async function updateMetrics(metrics) {
-  const client = await pool.connect();
+// Calls the analysis server and adds the stages it reports to `timings`, even when the call fails
+async function serverStage(timings, method, params, onRecord) {
   try {
-    await client.query("BEGIN");
-
-    for (const m of metrics) {
-      await client.query(`
-        INSERT INTO metrics (
-          commit_id, ns, nd, nf, entropy, la, ld, lt,
-          ndev, age, nuc, exp, rexp, sexp, computed_at
-        ) VALUES (
-          (SELECT id FROM commits WHERE hash = $1),
-          $2, $3, $4, $5, $6, $7, $8,
-          $9, $10, $11, $12, $13, $14, NOW()
-        )
-        ON CONFLICT (commit_id) DO UPDATE SET
-          ns = EXCLUDED.ns,
-          nd = EXCLUDED.nd,
-          nf = EXCLUDED.nf,
-          entropy = EXCLUDED.entropy,
-          la = EXCLUDED.la,
-          ld = EXCLUDED.ld,
-          lt = EXCLUDED.lt,
-          ndev = EXCLUDED.ndev,
-          age = EXCLUDED.age,
-          nuc = EXCLUDED.nuc,
-          exp = EXCLUDED.exp,
-          rexp = EXCLUDED.rexp,
-          sexp = EXCLUDED.sexp,
-          computed_at = NOW();
-      `, [
-        m.hash, m.ns, m.nd, m.nf, m.entropy,
-        m.la, m.ld, m.lt, m.ndev,
-        m.age, m.nuc, m.exp, m.rexp, m.sexp
-      ]);
-    }
-
-    await client.query("COMMIT");
+    const result = await analysis.call(process.env.ANALYSIS_SOCKET, method, params, onRecord);
+    timings.addAll(result.timings);
+    return result;
   } catch (e) {
-    await client.query("ROLLBACK");
+    timings.addAll(e.timings);
     throw e;
-  } finally {
-    client.release();
   }
 }
 
-module.exports = async (payload) => {
-  const { jobId, repoUrl, repoId, token } = payload;
-  const repoName = path.basename(repoUrl, ".git");
-  const targetDir = path.join("repos", repoName);
+// Runs an analysis stage on the long-lived server when index.js started one
+// (ANALYSIS_SOCKET), otherwise as a one-off script in --ndjson mode.
+async function runStage(timings, method, params, scriptPath, args, onRecord) {
+  if (process.env.ANALYSIS_SOCKET) {
+    return serverStage(timings, method, params, onRecord);
+  }
+  return timedScript(timings, scriptPath, args, (a) => streamPython(scriptPath, a, onRecord));
+}
 
-  try {
-    // 1. Clone repository
-    await update(jobId, "Cloning repository");
-    const branch = null; // null for now, can be set to a specific branch later based on user input
-    const cloneArgs = ["-u", repoUrl, "-d", "repos"];
+// Mirrors stay shared by every checkout, whatever directory the checkout is in
+const MIRRORS = process.env.CLONE_CACHE || path.join("repos", ".mirrors");
+
+// Clones into directory through the analysis server or clone.py and returns clone_repo's result
+async function cloneRepository(timings, repoUrl, directory, branch, token) {
+  let cloned;
+  if (process.env.ANALYSIS_SOCKET) {
+    cloned = await serverStage(timings, "clone", { url: repoUrl, directory, cache: MIRRORS, branch, token });
+  } else {
+    const cloneArgs = ["-u", repoUrl, "-d", directory, "-c", MIRRORS, "--json"];
     if (branch !== null && branch !== undefined) {
       console.log(`Cloning branch: ${branch}`);
       cloneArgs.push("-b", branch);
@@ -172,59 +148,152 @@ module.exports = async (payload) => {
     if (token) {
       cloneArgs.push("-t", token);
     }
-    const cloneResultRaw = await runPython("../ingestion/clone.py", cloneArgs);
+    const stdout = await timedScript(timings, "../ingestion/clone.py", cloneArgs, (a) => runPython("../ingestion/clone.py", a));
+    cloned = JSON.parse(stdout.trim().split("\n").pop());
+  }
+  if (cloned.status === "error") throw new Error(`${cloned.message}: ${cloned.error}`);
+  return cloned;
+}
+
+// Metric-state checkpoints, one per repository, kept apart from the checkouts that are deleted after each job
+const CHECKPOINTS = process.env.CHECKPOINT_DIR || path.join("repos", ".checkpoints");
 
-    // // 2. Extract and classify commits
+// Commits stored by earlier analyses: the cost estimate until clone reports the real count
+async function previousCommitCount(repoId) {
+  const res = await pool.query("SELECT COUNT(*)::int AS n FROM commits WHERE repository_id = $1", [repoId]);
+  return res.rows[0].n || scheduler.DEFAULT_COST;
+}
+
+function toMetricsRow(c) {
+  return {
+    hash: c.hash,
+    ns: c.metrics.ns || 0,
+    nd: c.metrics.nd || 0,
+    nf: c.metrics.nf || 0,
+    entropy: c.metrics.entropy || 0,
+    la: c.metrics.la || 0,
+    ld: c.metrics.ld || 0,
+    lt: c.metrics.lt || 0,
+    ndev: c.metrics.ndev || 0,
+    age: c.metrics.age || 0,
+    nuc: c.metrics.nuc || 0,
+    exp: c.metrics.exp || 0,
+    rexp: c.metrics.rexp || 0,
+    sexp: c.metrics.sexp || 0
+  };
+}
+
+module.exports = async (payload) => {
+  const { jobId, repoUrl, repoId, token } = payload;
+  const { key, directory, targetDir } = scheduler.checkoutIdentity("repos", repoUrl, token);
+  const socketPath = process.env.ANALYSIS_SOCKET;
+  const timings = new JobTimings();
+  // Re-scans resume the metrics from the last completed job's checkpoint and only analyse new commits.
+  // The job writes its own copy, which replaces the saved one only once the job completes, so a
+  // failed job never moves the checkpoint past commits that were not stored and linked
+  const checkpoint = path.resolve(CHECKPOINTS, `${repoId}.json`);
+  const jobCheckpoint = path.resolve(CHECKPOINTS, `${repoId}.${jobId}.json`);
+  // Jobs only share a clone made with the same credentials
+  const checkout = scheduler.checkouts.acquire(key, directory, async () => {
+    const branch = null; // null for now, can be set to a specific branch later based on user input
+    const estimate = await previousCommitCount(repoId);
+    return scheduler.clones.run(estimate, () => cloneRepository(timings, repoUrl, directory, branch, token));
+  });
+
+  try {
+    // 1. Clone repository, or wait for the clone another job for this URL started
+    await update(jobId, "Cloning repository");
+    const cloned = await checkout.ready;
+    const cost = cloned.commits || (await previousCommitCount(repoId));
+    if (socketPath) {
+      await analysis.call(socketPath, "open", { job: jobId, path: path.resolve(targetDir) });
+    }
+
+    // // 2. Extract, classify and measure commits in one pass over history,
+    // storing commits and their metrics batch by batch while the walk runs
     await update(jobId, "Extracting and classifying commits");
-    const extractRaw = await runPython("../analysis/classify_commits.py", ["-p", targetDir]);
-    const extracted = JSON.parse(extractRaw);
-    if (extracted.status !== "success") throw new Error("Extract failed");
-    // console.log("Corrective commits:", extracted.corrective_commits);
-    await storeCommits(extracted.commits, repoId);
+    const corrective = [];
+    let batch = [];
+    const flushCommits = async () => {
+      const metrics = batch.filter((c) => c.metrics).map(toMetricsRow);
+      await timings.time("db.storeCommits", batch.length, () => persist.storeCommits(pool, batch, repoId));
+      await timings.time("db.updateMetrics", metrics.length, () => persist.updateMetrics(pool, metrics));
+      batch = [];
+    };
+    const historyWorkers = String(process.env.HISTORY_WORKERS || 1);
+    // Commit selection shared by the walk and the linker: all, no-merges or first-parent
+    const merges = process.env.HISTORY_MERGES || "all";
+    fs.mkdirSync(CHECKPOINTS, { recursive: true });
+    const resume = fs.existsSync(checkpoint);
+    if (resume) fs.copyFileSync(checkpoint, jobCheckpoint);
+    const analyzeParams = {
+      job: jobId, workers: Number(historyWorkers), merges, checkpoint: jobCheckpoint, since_checkpoint: resume,
+    };
+    const analyzeArgs = ["-p", targetDir, "--workers", historyWorkers, "--merges", merges, "--checkpoint", jobCheckpoint];
+    if (resume) analyzeArgs.push("--since-checkpoint");
+    const extracted = await scheduler.heavy.run(cost, async () => {
+      const summary = await runStage(timings, "analyze", analyzeParams, "../analysis/analyze_history.py", analyzeArgs, async (c) => {
+        if (c.classification === "Corrective") corrective.push(c.hash);
+        batch.push(c);
+        if (batch.length >= BATCH_SIZE) await flushCommits();
+      });
+      await flushCommits();
+      return summary;
+    });
+    console.log(`Stored ${extracted.total_commits} commits with metrics`);
 
     // // 3. Link bug-inducing commits
     await update(jobId, "Linking bug-inducing commits");
-    const correctivePath = path.join(targetDir, "corrective.json");
-    fs.writeFileSync(correctivePath, JSON.stringify(extracted.corrective_commits, null, 2));
-    const linkRaw = await runPython("../analysis/link_commits.py", [targetDir, "--corrective", targetDir + "/corrective.json"]);
-    const linked = JSON.parse(linkRaw);
-    console.log("Linked commits:", linked);
-    await updateBugLinks(linked);
-
-    // 4. Compute metrics
-    await update(jobId, "Computing metrics");
-    const metricsRaw = await runPython("../analysis/compute_metrics.py", ["-p", targetDir]);
-    const metricsOutput = JSON.parse(metricsRaw);
-
-    // Convert and format each entry for DB insert
-    const parsedMetrics = metricsOutput.map((entry) => ({
-      hash: entry.commit_hash,
-      ns: entry.stats.ns || 0,
-      nd: entry.stats.nd || 0,
-      nf: entry.stats.nf || 0,
-      entropy: entry.stats.entropy || 0,
-      la: entry.stats.la || 0,
-      ld: entry.stats.ld || 0,
-      lt: entry.stats.lt || 0,
-      ndev: entry.stats.ndev || 0,
-      age: entry.stats.age || 0,
-      nuc: entry.stats.nuc || 0,
-      exp: entry.stats.exp || 0,
-      rexp: entry.stats.rexp || 0,  // optional
-      sexp: entry.stats.sexp || 0   // optional
-    }));
-
-    await updateMetrics(parsedMetrics);
-
-    // Print metrics
-    console.log("Metrics computed and stored:", parsedMetrics);
+    const correctivePath = path.join(targetDir, `corrective-${jobId}.json`);
+    fs.writeFileSync(correctivePath, JSON.stringify(corrective));
+    const linkJobs = String(process.env.LINK_JOBS || os.cpus().length);
+    const linkEngine = process.env.LINK_ENGINE || "blame";
+    const linkBackend = process.env.LINK_BACKEND || "threads";
+    const gitTimeout = process.env.LINK_GIT_TIMEOUT || "300";
+    let links = [];
+    const flushLinks = async () => {
+      await timings.time("db.updateBugLinks", links.length, () => persist.updateBugLinks(pool, links));
+      links = [];
+    };
+    const linkParams = {
+      job: jobId, fixes: corrective, jobs: Number(linkJobs), engine: linkEngine, merges,
+      backend: linkBackend, timeout: Number(gitTimeout),
+    };
+    const linkArgs = [
+      targetDir, "--corrective", correctivePath, "--jobs", linkJobs, "--engine", linkEngine, "--merges", merges,
+      "--backend", linkBackend, "--git-timeout", gitTimeout,
+    ];
+    const linked = await scheduler.heavy.run(cost, async () => {
+      const summary = await runStage(timings, "link", linkParams, "../analysis/link_commits.py", linkArgs, async (l) => {
+        links.push(l);
+        if (links.length >= BATCH_SIZE) await flushLinks();
+      });
+      await flushLinks();
+      return summary;
+    });
+    fs.rmSync(correctivePath, { force: true });
+    console.log(`Linked ${linked.total_links} bug-inducing commits`);
+    // Kept in the job log through the remaining steps, so a partial link is visible
+    const jobLog = linkErrorLog(linked);
+    if (jobLog) console.warn(`Job ${jobId}: ${jobLog}`);
 
+    // 4. Rebuild the per-repository rollups dashboards read
+    await update(jobId, "Aggregating metrics", "in_progress", jobLog);
+    await timings.time("db.refreshRollups", (rows) => rows, () => persist.refreshRollups(pool, repoId));
 
     // 5. Done
-    await markDone(jobId);
+    fs.renameSync(jobCheckpoint, checkpoint);
+    await markDone(jobId, jobLog);
     console.log(`Job ${jobId} completed successfully.`);
   } catch (err) {
     await markError(jobId, err.toString());
     console.error(`Job ${jobId} failed:`, err);
+  } finally {
+    if (socketPath) {
+      await analysis.call(socketPath, "close", { job: jobId }).catch(() => {});
+    }
+    checkout.release();
+    fs.rmSync(jobCheckpoint, { force: true });
+    await timings.save(pool, jobId).catch((e) => console.error(`Job ${jobId}: could not save timings:`, e));
   }
 };
\ No newline at end of file
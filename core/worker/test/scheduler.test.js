@@ -0,0 +1,66 @@
+const test = require("node:test");
+const assert = require("node:assert");
+const fs = require("fs");
+const os = require("os");
+const path = require("path");
+const { SharedCheckouts, checkoutIdentity } = require("../lib/scheduler");
+
+const URL = "https://github.com/acme/widgets.git";
+
+// Stands in for clone.py: writes a working tree into the checkout directory
+const fakeClone = (targetDir) => async () => {
+  fs.mkdirSync(targetDir, { recursive: true });
+  fs.writeFileSync(path.join(targetDir, "README"), "checkout");
+  return { status: "success", path: targetDir };
+};
+
+test("checkout directories do not accumulate across token changes", async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), "checkouts-"));
+  const checkouts = new SharedCheckouts();
+  try {
+    for (let i = 0; i < 5; i++) {
+      const { key, directory, targetDir } = checkoutIdentity(root, URL, `token-${i}`);
+      const checkout = checkouts.acquire(key, directory, fakeClone(targetDir));
+      await checkout.ready;
+      assert.strictEqual(fs.readdirSync(root).length, 1);
+      checkout.release();
+      await checkouts.removing.get(key);
+      assert.deepStrictEqual(fs.readdirSync(root), []);
+    }
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
+
+test("jobs with the same identity share one checkout until the last release", async () => {
+  const root = fs.mkdtempSync(path.join(os.tmpdir(), "checkouts-"));
+  const checkouts = new SharedCheckouts();
+  try {
+    const { key, directory, targetDir } = checkoutIdentity(root, URL, "token");
+    let clones = 0;
+    const clone = () => {
+      clones++;
+      return fakeClone(targetDir)();
+    };
+    const first = checkouts.acquire(key, directory, clone);
+    const second = checkouts.acquire(key, directory, clone);
+    await Promise.all([first.ready, second.ready]);
+    assert.strictEqual(clones, 1);
+
+    first.release();
+    assert.ok(fs.existsSync(targetDir));
+    second.release();
+    await checkouts.removing.get(key);
+    assert.ok(!fs.existsSync(directory));
+
+    // A job arriving afterwards clones again into the same directory
+    const third = checkouts.acquire(key, directory, clone);
+    await third.ready;
+    assert.strictEqual(clones, 2);
+    assert.ok(fs.existsSync(targetDir));
+    third.release();
+    await checkouts.removing.get(key);
+  } finally {
+    fs.rmSync(root, { recursive: true, force: true });
+  }
+});
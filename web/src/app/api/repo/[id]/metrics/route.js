@@ -84,11 +84,24 @@ export async function GET(req, { params }) {
           c.hash    ILIKE '%' || $6 || '%'
         )
     `;
-    const total = parseInt(
-      (await pool.query(countSql, [repoId, author, classification, startDate, endDate, search]))
-        .rows?.[0]?.total || "0",
-      10
-    );
+    // Without text or date filters the total is a sum over the repo's all-history
+    // rollup rows instead of a count over every commit
+    const rollupCountSql = `
+      SELECT COALESCE(SUM(commits), 0) AS total, COUNT(*) AS rows
+      FROM commit_rollups
+      WHERE repository_id = $1
+        AND period = '-infinity'
+        AND ($2::text IS NULL OR classification = $2)
+    `;
+    let totalRes = null;
+    if (!author && !startDate && !endDate && !search) {
+      totalRes = await pool.query(rollupCountSql, [repoId, classification]);
+      if (parseInt(totalRes.rows?.[0]?.rows || "0", 10) === 0) totalRes = null; // not aggregated yet
+    }
+    if (!totalRes) {
+      totalRes = await pool.query(countSql, [repoId, author, classification, startDate, endDate, search]);
+    }
+    const total = parseInt(totalRes.rows?.[0]?.total || "0", 10);
 
     return NextResponse.json({
       repo,
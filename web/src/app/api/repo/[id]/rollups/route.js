@@ -0,0 +1,67 @@
+import { NextResponse } from "next/server";
+import pkg from "pg";
+const { Pool } = pkg;
+
+const pool = new Pool({ connectionString: process.env.DATABASE_URL });
+
+// "2024-03" for a month, "total" for the whole-history row
+const PERIOD = `CASE WHEN period = '-infinity' THEN 'total' ELSE to_char(period, 'YYYY-MM') END`;
+
+// Dashboard aggregates precomputed by the worker (commit_rollups, metric_rollups):
+// monthly classification counts, bug-inducing rates and metric percentiles,
+// plus the same over the whole history under "total".
+export async function GET(req, { params }) {
+  const { id: repoId } = params;
+  const { searchParams } = new URL(req.url);
+  const startDate = searchParams.get("startDate") || null;
+  const endDate   = searchParams.get("endDate") || null;
+
+  try {
+    const commitsSql = `
+      SELECT ${PERIOD} AS period, classification, commits, bug_inducing
+      FROM commit_rollups
+      WHERE repository_id = $1
+        AND (period = '-infinity' OR (
+          ($2::date IS NULL OR period >= date_trunc('month', $2::date)) AND
+          ($3::date IS NULL OR period <= $3::date)
+        ))
+      ORDER BY period, classification
+    `;
+    const metricsSql = `
+      SELECT ${PERIOD} AS period, metric, commits, mean, p50, p90, p99
+      FROM metric_rollups
+      WHERE repository_id = $1
+        AND (period = '-infinity' OR (
+          ($2::date IS NULL OR period >= date_trunc('month', $2::date)) AND
+          ($3::date IS NULL OR period <= $3::date)
+        ))
+      ORDER BY period, metric
+    `;
+    const [commitsRes, metricsRes] = await Promise.all([
+      pool.query(commitsSql, [repoId, startDate, endDate]),
+      pool.query(metricsSql, [repoId, startDate, endDate]),
+    ]);
+
+    const periods = {};
+    const entry = (period) => (periods[period] ??= { classifications: {}, commits: 0, bug_inducing: 0, metrics: {} });
+
+    for (const r of commitsRes.rows) {
+      const p = entry(r.period);
+      p.classifications[r.classification || "unclassified"] = r.commits;
+      p.commits += r.commits;
+      p.bug_inducing += r.bug_inducing;
+    }
+    for (const r of metricsRes.rows) {
+      entry(r.period).metrics[r.metric] = { commits: r.commits, mean: r.mean, p50: r.p50, p90: r.p90, p99: r.p99 };
+    }
+    for (const p of Object.values(periods)) {
+      p.bug_rate = p.commits ? p.bug_inducing / p.commits : 0;
+    }
+
+    const { total = null, ...monthly } = periods;
+    return NextResponse.json({ total, periods: monthly });
+  } catch (error) {
+    console.error("[API /repo/:id/rollups] error", error);
+    return NextResponse.json({ error: "Failed to fetch repository rollups" }, { status: 500 });
+  }
+}